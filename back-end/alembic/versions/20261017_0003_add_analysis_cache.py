@@ -0,0 +1,32 @@
+"""add analysis result cache table
+
+Revision ID: 20261017_0003
+Revises: 20260208_0002
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0003"
+down_revision = "20260208_0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_cache",
+        sa.Column("cache_key", sa.String(length=64), primary_key=True, nullable=False),
+        sa.Column("model", sa.String(length=128), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.Column("analysis_meta", sa.JSON(), nullable=False),
+        sa.Column("expires_at_epoch", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_analysis_cache_expires_at_epoch", "analysis_cache", ["expires_at_epoch"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_analysis_cache_expires_at_epoch", table_name="analysis_cache")
+    op.drop_table("analysis_cache")
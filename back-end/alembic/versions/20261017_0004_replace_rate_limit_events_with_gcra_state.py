@@ -0,0 +1,45 @@
+"""replace rate limit event log with per-key GCRA state
+
+Revision ID: 20261017_0004
+Revises: 20261017_0003
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0004"
+down_revision = "20261017_0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rate_limit_state",
+        sa.Column("key", sa.String(length=255), primary_key=True, nullable=False),
+        sa.Column("tat", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_rate_limit_state_tat", "rate_limit_state", ["tat"])
+
+    # Rate-limit history only matters for the current minute, so it is not migrated.
+    op.drop_index("ix_rate_limit_events_ts_epoch", table_name="rate_limit_events")
+    op.drop_index("ix_rate_limit_events_key", table_name="rate_limit_events")
+    op.drop_index("ix_rate_limit_events_id", table_name="rate_limit_events")
+    op.drop_table("rate_limit_events")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "rate_limit_events",
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("ts_epoch", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_rate_limit_events_id", "rate_limit_events", ["id"])
+    op.create_index("ix_rate_limit_events_key", "rate_limit_events", ["key"])
+    op.create_index("ix_rate_limit_events_ts_epoch", "rate_limit_events", ["ts_epoch"])
+
+    op.drop_index("ix_rate_limit_state_tat", table_name="rate_limit_state")
+    op.drop_table("rate_limit_state")
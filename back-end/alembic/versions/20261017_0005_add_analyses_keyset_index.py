@@ -0,0 +1,28 @@
+"""add composite keyset index on analyses and drop redundant id index
+
+Revision ID: 20261017_0005
+Revises: 20261017_0004
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0005"
+down_revision = "20261017_0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_analyses_owner_created_at_id",
+        "analyses",
+        ["owner_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    op.drop_index("ix_analyses_id", table_name="analyses")
+
+
+def downgrade() -> None:
+    op.create_index("ix_analyses_id", "analyses", ["id"])
+    op.drop_index("ix_analyses_owner_created_at_id", table_name="analyses")
@@ -0,0 +1,39 @@
+"""add per-owner daily analysis rollups
+
+Revision ID: 20261017_0006
+Revises: 20261017_0005
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0006"
+down_revision = "20261017_0005"
+branch_labels = None
+depends_on = None
+
+METRICS = ("score", "clarity", "emotion", "credibility", "market_effectiveness")
+
+
+def upgrade() -> None:
+    metric_columns = [
+        sa.Column(f"{metric}_{suffix}", sa.Integer(), nullable=False)
+        for metric in METRICS
+        for suffix in ("sum", "min", "max")
+    ]
+    op.create_table(
+        "analysis_rollups",
+        sa.Column("owner_key", sa.String(length=128), primary_key=True, nullable=False),
+        sa.Column("day", sa.Date(), primary_key=True, nullable=False),
+        sa.Column("tone", sa.String(length=32), primary_key=True, nullable=False),
+        sa.Column("persona", sa.String(length=32), primary_key=True, nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("gemini_count", sa.Integer(), nullable=False),
+        sa.Column("fallback_count", sa.Integer(), nullable=False),
+        *metric_columns,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("analysis_rollups")
@@ -0,0 +1,46 @@
+"""add archived analyses index and stop SQLite reusing analysis ids
+
+Revision ID: 20261017_0007
+Revises: 20261017_0006
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0007"
+down_revision = "20261017_0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archived_analyses",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False, nullable=False),
+        sa.Column("owner_id", sa.String(length=128), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("segment", sa.String(length=512), nullable=False),
+        sa.Column("byte_offset", sa.BigInteger(), nullable=False),
+        sa.Column("line_number", sa.Integer(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    # Archived ids must stay unique; SQLite only guarantees that with AUTOINCREMENT.
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table(
+            "analyses",
+            recreate="always",
+            table_kwargs={"sqlite_autoincrement": True},
+        ):
+            pass
+        # Batch recreation reflects the keyset index without its DESC ordering.
+        op.drop_index("ix_analyses_owner_created_at_id", table_name="analyses")
+        op.create_index(
+            "ix_analyses_owner_created_at_id",
+            "analyses",
+            ["owner_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("archived_analyses")
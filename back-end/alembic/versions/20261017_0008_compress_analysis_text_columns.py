@@ -0,0 +1,89 @@
+"""store analysis message, suggestion and analysis_meta compressed
+
+Revision ID: 20261017_0008
+Revises: 20261017_0007
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from compression import decode_text, encode_text, is_encoded
+
+revision = "20261017_0008"
+down_revision = "20261017_0007"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("message", "suggestion", "analysis_meta")
+BATCH_SIZE = 500
+
+analyses = sa.table(
+    "analyses",
+    sa.column("id", sa.Integer()),
+    *(sa.column(name, sa.LargeBinary()) for name in COLUMNS),
+)
+
+
+def _rewrite_in_batches(convert) -> None:
+    """Keyset-walk analyses by id, rewriting each batch in its own statement."""
+    bind = op.get_bind()
+    update = (
+        analyses.update()
+        .where(analyses.c.id == sa.bindparam("row_id"))
+        .values({name: sa.bindparam(f"new_{name}") for name in COLUMNS})
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(analyses).where(analyses.c.id > last_id).order_by(analyses.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        params = []
+        for row in rows:
+            values = {f"new_{name}": convert(getattr(row, name)) for name in COLUMNS}
+            if any(values[f"new_{name}"] is not getattr(row, name) for name in COLUMNS):
+                params.append({"row_id": row.id, **values})
+        if params:
+            bind.execute(update, params)
+        last_id = rows[-1].id
+
+
+def _compress(value):
+    if value is None or is_encoded(value):
+        return value
+    return encode_text(decode_text(value))
+
+
+def _decompress(value):
+    if value is None or not is_encoded(value):
+        return value
+    return decode_text(value).encode("utf-8")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE analyses ALTER COLUMN message TYPE BYTEA USING convert_to(message, 'UTF8')")
+        op.execute("ALTER TABLE analyses ALTER COLUMN suggestion TYPE BYTEA USING convert_to(suggestion, 'UTF8')")
+        op.execute(
+            "ALTER TABLE analyses ALTER COLUMN analysis_meta TYPE BYTEA "
+            "USING convert_to(analysis_meta::text, 'UTF8')"
+        )
+    # SQLite keeps its declared column types; BLOB values are stored as-is.
+    _rewrite_in_batches(_compress)
+
+
+def downgrade() -> None:
+    _rewrite_in_batches(_decompress)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE analyses ALTER COLUMN message TYPE TEXT USING convert_from(message, 'UTF8')")
+        op.execute("ALTER TABLE analyses ALTER COLUMN suggestion TYPE TEXT USING convert_from(suggestion, 'UTF8')")
+        op.execute(
+            "ALTER TABLE analyses ALTER COLUMN analysis_meta TYPE JSON "
+            "USING convert_from(analysis_meta, 'UTF8')::json"
+        )
+    else:
+        # Plain UTF-8 bytes would read back as BLOBs; restore TEXT storage.
+        for name in COLUMNS:
+            op.execute(f"UPDATE analyses SET {name} = CAST({name} AS TEXT) WHERE typeof({name}) = 'blob'")
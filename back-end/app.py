@@ -1,27 +1,55 @@
 import asyncio
+import base64
+import binascii
+import codecs
+import copy
+import hashlib
+import importlib.util
 import ipaddress
 import json
 import logging
 import os
 import re
 import socket
+import threading
 import time
 import uuid
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional, Tuple
+from contextvars import ContextVar
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Literal, Optional, Set, Tuple, Union
 from urllib.parse import urljoin, urlparse
 
 import anyio
+import httpcore
 import httpx
-from db import get_db, init_db
+from db import SessionLocal, async_engine, dialect_insert, get_session, init_db, pool_stats
+from metrics import (
+    METRICS_ENABLED,
+    format_server_timing,
+    format_timings,
+    mark_process_dead,
+    observe_request,
+    record_analysis,
+    render as render_metrics,
+    request_timings,
+    time_stage,
+    track_in_flight,
+)
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from models import Analysis, RateLimitEvent
+from models import Analysis, AnalysisCacheEntry, ArchivedAnalysis, RateLimitState
 from pydantic import BaseModel
-from sqlalchemy import func
+from retention import read_archived_record
+from rollups import apply_rollups, query_rollups, summarize_rollups
+from sqlalchemy import case, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 try:
@@ -30,8 +58,9 @@ except Exception:  # pragma: no cover - optional dependency
     genai = None
 
 try:
-    from jose import jwt
+    from jose import jwk, jwt
 except Exception:  # pragma: no cover - optional dependency
+    jwk = None
     jwt = None
 
 load_dotenv()
@@ -51,8 +80,38 @@ if not CLERK_JWKS_URL and CLERK_ISSUER:
     CLERK_JWKS_URL = f"{CLERK_ISSUER}/.well-known/jwks.json"
 CLERK_AUDIENCE = os.getenv("CLERK_AUDIENCE", "").strip()
 JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "3600"))
+JWKS_REFRESH_INTERVAL = int(os.getenv("JWKS_REFRESH_INTERVAL", "900"))
+JWKS_KID_MISS_INTERVAL = float(os.getenv("JWKS_KID_MISS_INTERVAL", "30"))
+JWKS_RETRY_BACKOFF = float(os.getenv("JWKS_RETRY_BACKOFF", "5"))
+JWKS_RETRY_MAX_BACKOFF = float(os.getenv("JWKS_RETRY_MAX_BACKOFF", "300"))
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+AUTH_CLOCK_SKEW = int(os.getenv("AUTH_CLOCK_SKEW", "30"))
 AUTO_CREATE_DB = os.getenv("AUTO_CREATE_DB", "true").strip().lower() in ("1", "true", "yes")
 RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "db").strip().lower()
+RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "100000"))
+DB_PRUNE_INTERVAL = int(os.getenv("DB_PRUNE_INTERVAL", "300"))
+GEMINI_CLIENT_MODE = os.getenv("GEMINI_CLIENT_MODE", "thread").strip().lower()
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+GEMINI_JSON_MODE = os.getenv("GEMINI_JSON_MODE", "true").strip().lower() in ("1", "true", "yes")
+GEMINI_API_BASE_URL = "https://generativelanguage.googleapis.com"
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "false").strip().lower() in ("1", "true", "yes")
+URL_CACHE_TTL = int(os.getenv("URL_CACHE_TTL", "900"))
+URL_CACHE_MAX_BYTES = int(os.getenv("URL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+URL_CACHE_DIR = os.getenv("URL_CACHE_DIR", "").strip()
+URL_CACHE_DISK_MAX_BYTES = int(os.getenv("URL_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+URL_CACHE_DISK_MAX_AGE = int(os.getenv("URL_CACHE_DISK_MAX_AGE", str(7 * 24 * 3600)))
+DNS_CACHE_TTL = int(os.getenv("DNS_CACHE_TTL", "60"))
+DNS_NEGATIVE_CACHE_TTL = int(os.getenv("DNS_NEGATIVE_CACHE_TTL", "10"))
+DNS_CACHE_MAX_ENTRIES = int(os.getenv("DNS_CACHE_MAX_ENTRIES", "4096"))
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
 
 client = None
 if genai and GOOGLE_API_KEY:
@@ -96,12 +155,62 @@ Rules:
 - If evidence is weak, explicitly call it out through diagnostics/evidence_needs.
 """
 
+_STRING_LIST_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+# The output schema from GEMINI_SYSTEM_PROMPT, enforced by Gemini's JSON mode.
+# The Google AI API rejects numeric bounds here; _coerce_score clamps instead.
+GEMINI_RESPONSE_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER"},
+        "clarity": {"type": "INTEGER"},
+        "emotion": {"type": "INTEGER"},
+        "credibility": {"type": "INTEGER"},
+        "market_effectiveness": {"type": "INTEGER"},
+        "suggestion": {"type": "STRING"},
+        "insights": _STRING_LIST_SCHEMA,
+        "confidence": {"type": "NUMBER"},
+        "diagnostics": {
+            "type": "OBJECT",
+            "properties": {
+                "target_audience": {"type": "STRING"},
+                "primary_intent": {"type": "STRING"},
+                "core_claims": _STRING_LIST_SCHEMA,
+                "gaps": _STRING_LIST_SCHEMA,
+                "risks": _STRING_LIST_SCHEMA,
+            },
+            "required": ["target_audience", "primary_intent", "core_claims", "gaps", "risks"],
+        },
+        "rewrite_options": _STRING_LIST_SCHEMA,
+        "evidence_needs": _STRING_LIST_SCHEMA,
+    },
+    "required": [
+        "score",
+        "clarity",
+        "emotion",
+        "credibility",
+        "market_effectiveness",
+        "suggestion",
+        "insights",
+        "confidence",
+        "diagnostics",
+        "rewrite_options",
+        "evidence_needs",
+    ],
+}
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("pitchlens_backend")
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    global _gemini_limiter
+
+    if GEMINI_CLIENT_MODE not in ("thread", "async"):
+        raise RuntimeError("GEMINI_CLIENT_MODE must be either 'thread' or 'async'.")
+    if RATE_LIMIT_BACKEND not in ("db", "memory"):
+        raise RuntimeError("RATE_LIMIT_BACKEND must be either 'db' or 'memory'.")
     if REQUIRE_AUTH and not jwt:
         raise RuntimeError("REQUIRE_AUTH is enabled but python-jose is not installed.")
     if REQUIRE_AUTH and (not CLERK_ISSUER or not CLERK_JWKS_URL):
@@ -119,7 +228,30 @@ async def lifespan(_: FastAPI):
 
     if AUTO_CREATE_DB:
         init_db()
-    yield
+
+    _gemini_limiter = anyio.CapacityLimiter(max(1, GEMINI_MAX_CONCURRENCY))
+    for name in _HTTP_CLIENT_NAMES:
+        _get_http_client(name)
+    background_tasks: List["asyncio.Task[None]"] = []
+    if DB_PRUNE_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(_run_periodic_pruning()))
+    if CLERK_JWKS_URL and jwt:
+        # Warm the key set so the first authenticated request skips the fetch.
+        await _refresh_jwks_quietly()
+        if JWKS_REFRESH_INTERVAL > 0:
+            background_tasks.append(asyncio.create_task(_run_jwks_refresher()))
+    try:
+        yield
+    finally:
+        background_tasks.extend(_jwks_refresh_tasks)
+        for task in background_tasks:
+            task.cancel()
+        # Let pruning and JWKS refreshes unwind before their clients and engine go away.
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await _close_http_clients()
+        if async_engine is not None:
+            await async_engine.dispose()
+        mark_process_dead()
 
 
 app = FastAPI(
@@ -133,18 +265,47 @@ app = FastAPI(
 @app.middleware("http")
 async def add_request_id(request: Request, call_next):
     request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-    response = await call_next(request)
+    started = time.perf_counter()
+    status = 500
+    with request_timings() as timings:
+        try:
+            with track_in_flight("http"):
+                response = await call_next(request)
+            status = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            observe_request(request.method, _route_template(request), status, elapsed)
+    # Streaming bodies are still being produced here; their later stages are
+    # only in the stage histograms.
     response.headers["X-Request-ID"] = request_id
+    response.headers["Server-Timing"] = format_server_timing(timings, elapsed)
     logger.info(
-        "request_id=%s method=%s path=%s status=%s",
+        "request_id=%s method=%s path=%s status=%s duration_ms=%.1f timings=%s",
         request_id,
         request.method,
         request.url.path,
         response.status_code,
+        elapsed * 1000,
+        format_timings(timings),
     )
     return response
 
 
+_route_templates: Dict[Any, str] = {}
+
+
+def _route_template(request: Request) -> str:
+    """Path template of the matched route, keeping metric label cardinality bounded."""
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if not _route_templates:
+        for route in app.routes:
+            if hasattr(route, "endpoint"):
+                _route_templates.setdefault(route.endpoint, route.path)
+    return _route_templates.get(endpoint, "unmatched")
+
+
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "")
 origins = [origin.strip() for origin in allowed_origins.split(",") if origin.strip()]
 if not origins:
@@ -159,11 +320,263 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
 security = HTTPBearer(auto_error=False)
-_jwks_cache: Dict[str, Any] = {"keys": None, "fetched_at": 0.0}
-_rate_limit_cache: Dict[str, List[int]] = {}
+_jwks_cache: Dict[str, Any] = {
+    "keys": None,
+    "fetched_at": 0.0,
+    "by_kid": {},
+    "key_objects": {},
+    "kid_miss_at": float("-inf"),
+    # Request-triggered refreshes wait until this monotonic time; pushed back on failures.
+    "retry_at": float("-inf"),
+    "failures": 0,
+}
+_jwks_refresh_tasks: Set["asyncio.Task[None]"] = set()
+_gemini_limiter: Optional[anyio.CapacityLimiter] = None
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+_http_request_counts: Dict[str, int] = {}
+
+
+class _TTLCache:
+    """In-process LRU map whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Any) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _SingleFlight:
+    """Coalesces concurrent calls sharing a key onto one in-flight task."""
+
+    def __init__(self) -> None:
+        self._in_flight: Dict[Any, "asyncio.Future[Any]"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return ``(value, shared)``; ``shared`` is true when another caller led the call."""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        # Shielded so one caller disconnecting does not cancel the call for the rest.
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Any, task: "asyncio.Future[Any]") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+class _UrlContentCache:
+    """Extracted URL text keyed on the final URL after redirects.
+
+    Entries keep the response's ETag/Last-Modified so stale text can be
+    revalidated with a conditional GET. Memory is bounded by total text size;
+    the optional disk tier (one JSON file per URL) survives restarts and is
+    bounded by `sweep_disk`, which the pruning task runs periodically.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_bytes: int,
+        disk_dir: str,
+        disk_max_bytes: int = 0,
+        disk_max_age: float = 0,
+    ) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_max_age = disk_max_age
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._aliases: Dict[str, str] = {}
+        self._alias_sources: Dict[str, set] = {}
+        self._bytes = 0
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    async def get(self, url: str) -> Optional[Dict[str, Any]]:
+        if self.ttl <= 0:
+            return None
+        entry = self._entries.get(self._aliases.get(url, url))
+        if entry is None and self.disk_dir:
+            entry = await anyio.to_thread.run_sync(self._read_disk, url)
+            if entry is not None:
+                self._remember(url, entry)
+        if entry is None:
+            return None
+        if not self.is_fresh(entry) and not (entry.get("etag") or entry.get("last_modified")):
+            self._discard(entry["url"])
+            return None
+        self._entries.move_to_end(entry["url"])
+        return entry
+
+    async def put(self, url: str, entry: Dict[str, Any]) -> None:
+        if self.ttl <= 0:
+            return
+        self._remember(url, entry)
+        if self.disk_dir:
+            try:
+                await anyio.to_thread.run_sync(self._write_disk, url, entry)
+            except OSError as exc:
+                logger.warning("URL cache disk write failed (%s).", exc)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._aliases.clear()
+        self._alias_sources.clear()
+        self._bytes = 0
+
+    def _remember(self, url: str, entry: Dict[str, Any]) -> None:
+        final_url = entry["url"]
+        size = len(entry["text"].encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._discard(final_url, keep_aliases=True)
+        self._entries[final_url] = {**entry, "size": size}
+        self._bytes += size
+        if url != final_url:
+            self._aliases[url] = final_url
+            self._alias_sources.setdefault(final_url, set()).add(url)
+        while self._bytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, final_url: str, keep_aliases: bool = False) -> None:
+        entry = self._entries.pop(final_url, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+        if not keep_aliases:
+            for alias in self._alias_sources.pop(final_url, ()):
+                self._aliases.pop(alias, None)
+
+    def _disk_path(self, url: str) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_disk(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._disk_path(url), "r", encoding="utf-8") as handle:
+                record = json.load(handle)
+            if "alias" in record:
+                with open(self._disk_path(record["alias"]), "r", encoding="utf-8") as handle:
+                    record = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return record
+
+    def _write_disk(self, url: str, entry: Dict[str, Any]) -> None:
+        os.makedirs(self.disk_dir, exist_ok=True)
+        record = {key: entry.get(key) for key in ("url", "text", "etag", "last_modified", "fetched_at")}
+        self._write_json(self._disk_path(entry["url"]), record)
+        if url != entry["url"]:
+            self._write_json(self._disk_path(url), {"alias": entry["url"]})
+
+    def sweep_disk(self) -> int:
+        """Delete disk files older than `disk_max_age`, then the oldest until under `disk_max_bytes`."""
+        if not self.disk_dir:
+            return 0
+        try:
+            names = os.listdir(self.disk_dir)
+        except FileNotFoundError:
+            return 0
+        files: List[Tuple[float, int, str]] = []
+        for name in names:
+            path = os.path.join(self.disk_dir, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+
+        cutoff = time.time() - self.disk_max_age if self.disk_max_age > 0 else float("-inf")
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        # Oldest first; alias files left pointing at a removed entry read as misses.
+        for mtime, size, path in sorted(files):
+            if mtime >= cutoff and (self.disk_max_bytes <= 0 or total <= self.disk_max_bytes):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _write_json(path: str, record: Dict[str, Any]) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(record, handle)
+        os.replace(tmp_path, path)
+
+
+_analysis_cache = _TTLCache(ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_TTL)
+_analysis_flight = _SingleFlight()
+_jwks_flight = _SingleFlight()
+_url_fetch_flight = _SingleFlight()
+_url_content_cache = _UrlContentCache(
+    URL_CACHE_TTL,
+    URL_CACHE_MAX_BYTES,
+    URL_CACHE_DIR,
+    disk_max_bytes=URL_CACHE_DISK_MAX_BYTES,
+    disk_max_age=URL_CACHE_DISK_MAX_AGE,
+)
+_dns_cache = _TTLCache(DNS_CACHE_MAX_ENTRIES, DNS_CACHE_TTL)
+# Pin key -> addresses that passed the SSRF check, for the fetch running in
+# this context. Carried with the request rather than kept in a shared cache,
+# so it cannot be evicted or disabled between the check and the connect.
+_pinned_addresses: ContextVar[Dict[str, Tuple[ipaddress._BaseAddress, ...]]] = ContextVar(
+    "pinned_addresses", default={}
+)
+# SHA-256 of a bearer token -> verified `sub`; entries carry per-token TTLs.
+_verified_tokens = _TTLCache(AUTH_TOKEN_CACHE_MAX_ENTRIES, 0)
 
 
 class AnalyzeRequest(BaseModel):
@@ -193,11 +606,64 @@ class AnalysisRecordResponse(AnalyzeResponse):
     analysis_meta: Optional[Dict[str, Any]] = None
 
 
+class AnalysisSummaryResponse(BaseModel):
+    id: int
+    created_at: datetime
+    tone: str
+    persona: str
+    score: int
+    clarity: int
+    emotion: int
+    credibility: int
+    market_effectiveness: int
+
+
+class MetricStats(BaseModel):
+    avg: float
+    min: int
+    max: int
+
+
+class AnalysisStatsBucket(BaseModel):
+    period: date
+    count: int
+    gemini_count: int
+    fallback_count: int
+    metrics: Dict[str, MetricStats]
+
+
+class AnalysisStatsResponse(BaseModel):
+    granularity: Literal["day", "week", "month"]
+    start: date
+    end: date
+    buckets: List[AnalysisStatsBucket]
+
+
+class AnalyzeBatchRequest(BaseModel):
+    items: List[AnalyzeRequest]
+
+
+class AnalyzeBatchItemResult(BaseModel):
+    index: int
+    status_code: int
+    record: Optional[AnalysisRecordResponse] = None
+    error: Optional[str] = None
+
+
+class AnalyzeBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[AnalyzeBatchItemResult]
+
+
 MAX_FETCH_BYTES = 600_000
 FETCH_TIMEOUT = 10.0
 MAX_REDIRECTS = 3
 MAX_INSIGHT_CHARS = 220
 MAX_SUGGESTION_CHARS = 2000
+MAX_ANALYSIS_CHARS = 2000
+# One past the analysis limit, so over-long pages still fail the length check.
+FETCH_TEXT_CHAR_LIMIT = MAX_ANALYSIS_CHARS + 1
 ALLOWED_WEB_PORTS = {80, 443}
 
 
@@ -208,13 +674,56 @@ def _coerce_score(value: Any, default: int = 0) -> int:
         return default
 
 
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
 def _sanitize_text(value: Any, fallback: str = "") -> str:
     if not isinstance(value, str):
         return fallback
-    text = re.sub(r"\s+", " ", value).strip()
+    text = _WHITESPACE_RE.sub(" ", value).strip()
     return text
 
 
+_JSON_SCAN_RE = re.compile(r'[{}"\\]')
+_JSON_OPEN_RE = re.compile(r"{")
+_JSON_DECODER = json.JSONDecoder()
+_JSON_RESCAN_FACTOR = 4
+
+
+def _brace_ends(text: str, pos: int = 0) -> Dict[int, Optional[int]]:
+    """Map each `{` seen scanning from `pos` to the end of its balanced span (None if it never closes).
+
+    One pass over the structural characters. Quotes are tracked only inside
+    braces, so every brace recorded gets the span a scan starting at that brace
+    would find. Braces inside strings are not recorded: a scan from one of
+    them reads the text differently (for example `"{"` in prose).
+    """
+    ends: Dict[int, Optional[int]] = {}
+    opens: List[int] = []
+    in_string = False
+    skip_to = -1
+    for match in _JSON_SCAN_RE.finditer(text, pos):
+        idx = match.start()
+        if idx < skip_to:
+            continue
+        char = match.group()
+        if in_string:
+            if char == "\\":
+                skip_to = idx + 2
+            elif char == '"':
+                in_string = False
+        elif char == "{":
+            opens.append(idx)
+            ends[idx] = None
+        elif not opens:
+            continue
+        elif char == '"':
+            in_string = True
+        elif char == "}":
+            ends[opens.pop()] = idx + 1
+    return ends
+
+
 def _extract_json(text: str) -> dict:
     text = (text or "").strip()
     if not text:
@@ -227,54 +736,154 @@ def _extract_json(text: str) -> dict:
     except Exception:
         pass
 
-    starts = [idx for idx, char in enumerate(text) if char == "{"]
-    for start in starts:
-        depth = 0
-        in_string = False
-        escaped = False
-        for idx in range(start, len(text)):
-            char = text[idx]
-            if in_string:
-                if escaped:
-                    escaped = False
+    # Try each `{` in order, so an outer span that fails to parse falls through
+    # to the objects nested in it. One scan usually resolves every brace; a
+    # brace hidden inside a string needs its own scan, and those stop once the
+    # input has been scanned a few times over. Decoding is capped the same way:
+    # nested spans that fail late would otherwise each be decoded end to end.
+    ends: Dict[int, Optional[int]] = {}
+    budget = _JSON_RESCAN_FACTOR * len(text)
+    decode_budget = _JSON_RESCAN_FACTOR * len(text)
+    for match in _JSON_OPEN_RE.finditer(text):
+        start = match.start()
+        if start not in ends:
+            if budget <= 0:
+                continue
+            budget -= len(text) - start
+            ends.update(_brace_ends(text, start))
+        end = ends[start]
+        if end is None or end - start > decode_budget:
+            continue
+        decode_budget -= end - start
+        try:
+            # Decoding in place avoids copying a slice per candidate.
+            parsed, stop = _JSON_DECODER.raw_decode(text, start)
+        except Exception:
+            continue
+        if stop == end and isinstance(parsed, dict):
+            return parsed
+    raise ValueError("No valid JSON object found in Gemini output.")
+
+
+class _IncrementalJSONParser:
+    """Emits top-level fields of a streamed JSON object as each value completes.
+
+    Text before the opening brace (for example a markdown fence) is skipped and
+    everything after the closing brace is ignored. The full output should still
+    go through `_extract_json` once the stream ends.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expect_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        fields: List[Tuple[str, Any]] = []
+        if self.done:
+            return fields
+        self._buffer += chunk
+        buffer = self._buffer
+        for idx in range(self._pos, len(buffer)):
+            char = buffer[idx]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
                 elif char == "\\":
-                    escaped = True
+                    self._escaped = True
                 elif char == '"':
-                    in_string = False
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = self._decode(buffer[self._key_start : idx + 1])
+                        self._key_start = None
                 continue
-            if char == '"':
-                in_string = True
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._expect_key = True
                 continue
-            if char == "{":
-                depth += 1
-            elif char == "}":
-                depth -= 1
-                if depth == 0:
-                    candidate = text[start : idx + 1]
-                    try:
-                        parsed = json.loads(candidate)
-                        if isinstance(parsed, dict):
-                            return parsed
-                    except Exception:
-                        break
-    raise ValueError("No valid JSON object found in Gemini output.")
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = idx
+                    self._expect_key = False
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_field(buffer[:idx], fields)
+                    self.done = True
+                    break
+            elif self._depth == 1:
+                if char == ":":
+                    self._value_start = idx + 1
+                elif char == ",":
+                    self._complete_field(buffer[:idx], fields)
+                    self._expect_key = True
+        self._pos = len(buffer)
+        return fields
+
+    def _complete_field(self, buffer: str, fields: List[Tuple[str, Any]]) -> None:
+        if self._key is not None and self._value_start is not None:
+            raw_value = buffer[self._value_start :].strip()
+            try:
+                fields.append((self._key, json.loads(raw_value)))
+            except Exception:
+                pass
+        self._key = None
+        self._value_start = None
+
+    @staticmethod
+    def _decode(raw: str) -> Optional[str]:
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+
+
+# Keyword sets of the deterministic scorer, matched as plain substrings of the
+# lowercased text. A single combined regex pass measured 4-6x slower than
+# probing each phrase with `in` at every length up to MAX_ANALYSIS_CHARS.
+_CTA_PHRASES = (
+    "book a demo",
+    "schedule",
+    "let's talk",
+    "contact us",
+    "sign up",
+    "get started",
+    "start now",
+    "reply",
+    "apply now",
+    "learn more",
+)
+_EMOTION_WORDS = (
+    "exciting",
+    "amazing",
+    "love",
+    "delighted",
+    "great",
+    "success",
+    "powerful",
+    "win",
+    "thrilled",
+    "fantastic",
+    "wonderful",
+)
+_CREDIBILITY_WORDS = ("data", "research", "proven", "studies", "statistics", "evidence", "results", "facts")
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+_TRAILING_PUNCTUATION_RE = re.compile(r"[.!?]+$")
 
 
-def _contains_cta(text: str) -> bool:
-    patterns = (
-        "book a demo",
-        "schedule",
-        "let's talk",
-        "contact us",
-        "sign up",
-        "get started",
-        "start now",
-        "reply",
-        "apply now",
-        "learn more",
-    )
-    lowered = text.lower()
-    return any(phrase in lowered for phrase in patterns)
+def _count_phrases(lowered: str, phrases: Tuple[str, ...]) -> int:
+    return sum(1 for phrase in phrases if phrase in lowered)
 
 
 def _generate_structured_suggestion(
@@ -284,9 +893,9 @@ def _generate_structured_suggestion(
     emotional_hits: int,
 ) -> str:
     cleaned = _sanitize_text(message)
-    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", cleaned) if s.strip()]
+    sentences = [s.strip() for s in _SENTENCE_BREAK_RE.split(cleaned) if s.strip()]
     lead = sentences[0] if sentences else cleaned
-    lead = re.sub(r"[.!?]+$", "", lead).strip()
+    lead = _TRAILING_PUNCTUATION_RE.sub("", lead).strip()
 
     if len(lead) > 180:
         lead = lead[:177].rstrip() + "..."
@@ -369,25 +978,10 @@ def _normalize_analysis_output(
     source: str,
     fallback_candidates: List[str],
 ) -> Tuple[AnalyzeResponse, Dict[str, Any]]:
-    has_numbers = any(char.isdigit() for char in message)
-    has_cta = _contains_cta(message)
-    emotional_hits = sum(
-        1
-        for word in (
-            "exciting",
-            "amazing",
-            "love",
-            "delighted",
-            "great",
-            "success",
-            "powerful",
-            "win",
-            "thrilled",
-            "fantastic",
-            "wonderful",
-        )
-        if word in message.lower()
-    )
+    lowered = message.lower()
+    has_numbers = any(map(str.isdigit, message))
+    has_cta = any(phrase in lowered for phrase in _CTA_PHRASES)
+    emotional_hits = _count_phrases(lowered, _EMOTION_WORDS)
 
     suggestion = _sanitize_text(payload.get("suggestion"))
     if not suggestion:
@@ -447,22 +1041,173 @@ def _normalize_analysis_output(
     return response, meta
 
 
+_HTTP_CLIENT_NAMES = ("fetch", "jwks", "gemini")
+
+
+def _http2_enabled() -> bool:
+    if HTTP_ENABLE_HTTP2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP_ENABLE_HTTP2 is set but the h2 package is not installed. Using HTTP/1.1.")
+        return False
+    return HTTP_ENABLE_HTTP2
+
+
+def _build_http_client(name: str) -> httpx.AsyncClient:
+    async def count_request(request: httpx.Request) -> None:
+        _http_request_counts[name] = _http_request_counts.get(name, 0) + 1
+
+    options: Dict[str, Any] = {
+        "limits": httpx.Limits(
+            max_connections=HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+        ),
+        "http2": _http2_enabled(),
+        # Clients are shared across users, so never carry cookies between requests.
+        "cookies": httpx.Cookies(CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))),
+        "event_hooks": {"request": [count_request]},
+    }
+    if name == "fetch":
+        options.update(
+            timeout=FETCH_TIMEOUT,
+            follow_redirects=False,
+            trust_env=False,
+            transport=_PinnedTransport(limits=options["limits"], http2=options["http2"]),
+        )
+    elif name == "jwks":
+        options.update(timeout=10.0, trust_env=False)
+    elif name == "gemini":
+        pool_size = max(1, GEMINI_MAX_CONCURRENCY)
+        options.update(
+            base_url=GEMINI_API_BASE_URL,
+            timeout=GEMINI_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+    else:
+        raise ValueError(f"Unknown HTTP client: {name}")
+    return httpx.AsyncClient(**options)
+
+
+def _get_http_client(name: str) -> httpx.AsyncClient:
+    http_client = _http_clients.get(name)
+    if http_client is None:
+        http_client = _build_http_client(name)
+        _http_clients[name] = http_client
+    return http_client
+
+
+async def _close_http_clients() -> None:
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    for http_client in clients:
+        await http_client.aclose()
+
+
+def _http_pool_stats() -> Dict[str, Any]:
+    # Per client only: hosts come from user-supplied URLs and must not be listed here.
+    stats: Dict[str, Any] = {}
+    for name in _HTTP_CLIENT_NAMES:
+        http_client = _http_clients.get(name)
+        # httpx has no public accessor for its transport's httpcore pool.
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", ()))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        closed = sum(1 for connection in connections if connection.is_closed())
+        stats[name] = {
+            "open": http_client is not None,
+            "requests": _http_request_counts.get(name, 0),
+            "connections": len(connections) - closed,
+            "idle": idle,
+            "in_use": len(connections) - closed - idle,
+            "http2": sum(1 for connection in connections if "HTTP/2" in connection.info()),
+        }
+    return stats
+
+
 async def _resolve_host_ips(hostname: str) -> List[ipaddress._BaseAddress]:
+    cached = _dns_cache.get(hostname)
+    if cached is not None:
+        return list(cached)
+
     try:
         loop = asyncio.get_running_loop()
-        infos = await loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+        with time_stage("dns"):
+            infos = await loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
     except socket.gaierror:
-        return []
+        infos = []
 
     addresses: List[ipaddress._BaseAddress] = []
     for info in infos:
         try:
-            addresses.append(ipaddress.ip_address(info[4][0]))
+            address = ipaddress.ip_address(info[4][0])
         except Exception:
             continue
+        if address not in addresses:
+            addresses.append(address)
+    _dns_cache.set(hostname, tuple(addresses), ttl=DNS_CACHE_TTL if addresses else DNS_NEGATIVE_CACHE_TTL)
     return addresses
 
 
+def _pin_key(hostname: str) -> str:
+    try:
+        return hostname.encode("idna").decode("ascii").lower()
+    except UnicodeError:
+        return hostname.lower()
+
+
+class _PinnedNetworkBackend(httpcore.AsyncNetworkBackend):
+    """Connects only to the addresses `_assert_safe_fetch_target` validated for the current fetch.
+
+    The pool still keys connections on the hostname, so TLS SNI, certificate
+    verification and the Host header all keep the original name, while the
+    socket goes to an IP that passed the SSRF check without a second lookup.
+    """
+
+    def __init__(self) -> None:
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Any] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        addresses = _pinned_addresses.get().get(_pin_key(host))
+        if not addresses:
+            raise httpcore.ConnectError(f"Refusing to connect to unvalidated host: {host}")
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    str(address),
+                    port,
+                    timeout=timeout,
+                    local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as exc:
+                last_error = exc
+        raise last_error
+
+    async def connect_unix_socket(self, *args: Any, **kwargs: Any) -> httpcore.AsyncNetworkStream:
+        raise httpcore.ConnectError("Unix socket connections are not allowed.")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _PinnedTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        # httpx 0.27 does not accept a network backend, so swap it on the pool.
+        self._pool._network_backend = _PinnedNetworkBackend()
+
+
 def _is_disallowed_ip(address: ipaddress._BaseAddress) -> bool:
     return bool(
         address.is_private
@@ -473,7 +1218,8 @@ def _is_disallowed_ip(address: ipaddress._BaseAddress) -> bool:
     )
 
 
-async def _assert_safe_fetch_target(parsed_url) -> None:
+async def _assert_safe_fetch_target(parsed_url) -> Tuple[ipaddress._BaseAddress, ...]:
+    """Validate a fetch URL and return the resolved addresses it may connect to."""
     if parsed_url.scheme not in ("http", "https"):
         raise ValueError("Invalid URL scheme. Only http and https are allowed.")
 
@@ -495,73 +1241,188 @@ async def _assert_safe_fetch_target(parsed_url) -> None:
         raise ValueError("Unable to resolve URL host.")
     if any(_is_disallowed_ip(ip) for ip in resolved_ips):
         raise ValueError("Fetching from private or restricted network addresses is not allowed.")
+    return tuple(resolved_ips)
+
+
+class _TextCollector:
+    """Collapses whitespace incrementally and stops after `max_chars` characters."""
+
+    def __init__(self, max_chars: Optional[int] = None) -> None:
+        self.max_chars = max_chars
+        self._parts: List[str] = []
+        self._length = 0
+        self._needs_space = False
+        self.done = False
+
+    def feed(self, data: str) -> None:
+        self.add(data)
+
+    def separate(self) -> None:
+        self._needs_space = True
+
+    def add(self, data: str) -> None:
+        if self.done or not data:
+            return
+        collapsed = _WHITESPACE_RE.sub(" ", data)
+        if collapsed[0] == " ":
+            self._needs_space = True
+            collapsed = collapsed[1:]
+        trailing_space = collapsed.endswith(" ")
+        collapsed = collapsed.rstrip(" ")
+        if collapsed:
+            if self._needs_space and self._length:
+                collapsed = " " + collapsed
+            self._parts.append(collapsed)
+            self._length += len(collapsed)
+            self._needs_space = trailing_space
+        if self.max_chars is not None and self._length >= self.max_chars:
+            self.done = True
+
+    def close(self) -> str:
+        text = "".join(self._parts)
+        return text[: self.max_chars] if self.max_chars is not None else text
+
+
+class _VisibleTextExtractor(HTMLParser):
+    """Tokenizer-based HTML-to-text extraction that can be fed chunk by chunk.
+
+    Script and style contents are skipped, every tag acts as a word boundary,
+    and `done` flips once `max_chars` of visible text have been collected.
+    """
+
+    _SKIPPED_TAGS = frozenset(("script", "style"))
+
+    def __init__(self, max_chars: Optional[int] = None) -> None:
+        super().__init__(convert_charrefs=True)
+        self._collector = _TextCollector(max_chars)
+        self._skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return self._collector.done
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag in self._SKIPPED_TAGS:
+            self._skip_depth += 1
+        self._collector.separate()
 
+    def handle_startendtag(self, tag: str, attrs: Any) -> None:
+        self._collector.separate()
 
-def _basic_html_to_text(html: str) -> str:
-    html = re.sub(r"(?is)<script.*?>.*?</script>", " ", html)
-    html = re.sub(r"(?is)<style.*?>.*?</style>", " ", html)
-    text = re.sub(r"(?is)<.*?>", " ", html)
-    return re.sub(r"\s+", " ", text).strip()
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        self._collector.separate()
 
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self._collector.add(data)
 
-async def _read_limited_body(response: httpx.Response, max_bytes: int) -> bytes:
-    total = 0
-    chunks: List[bytes] = []
-    async for chunk in response.aiter_bytes():
-        total += len(chunk)
-        if total > max_bytes:
-            raise ValueError("Fetched content exceeded size limit.")
-        chunks.append(chunk)
-    return b"".join(chunks)
+    def close(self) -> str:
+        super().close()
+        return self._collector.close()
+
+
+def _incremental_decoder(encoding: Optional[str]) -> codecs.IncrementalDecoder:
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
 
 
 async def fetch_text_from_url(url: str) -> str:
+    with time_stage("url_fetch"), track_in_flight("url_fetch"):
+        text, _ = await _url_fetch_flight.do(url, lambda: _fetch_url_text(url))
+    return text
+
+
+async def _fetch_url_text(url: str) -> str:
+    cached = await _url_content_cache.get(url)
+    if cached and _url_content_cache.is_fresh(cached):
+        return cached["text"]
+
     current_url = url
-    async with httpx.AsyncClient(
-        timeout=FETCH_TIMEOUT,
-        follow_redirects=False,
-        trust_env=False,
-    ) as http_client:
-        for _ in range(MAX_REDIRECTS + 1):
-            parsed = urlparse(current_url)
-            await _assert_safe_fetch_target(parsed)
-
-            logger.info("Fetching content from URL: %s", current_url)
-            async with http_client.stream(
-                "GET",
-                current_url,
-                headers={"User-Agent": "PitchLensBot/1.1"},
-            ) as response:
-                if 300 <= response.status_code < 400 and response.headers.get("Location"):
-                    next_url = urljoin(current_url, response.headers["Location"])
-                    current_url = next_url
-                    continue
-
-                response.raise_for_status()
-
-                content_length = response.headers.get("Content-Length")
-                if content_length:
-                    try:
-                        if int(content_length) > MAX_FETCH_BYTES:
-                            raise ValueError("Fetched content exceeded size limit.")
-                    except ValueError:
-                        raise
-                    except Exception:
-                        pass
-
-                raw = await _read_limited_body(response, MAX_FETCH_BYTES)
-                content_type = response.headers.get("Content-Type", "").lower()
-                encoding = response.charset_encoding or "utf-8"
-                text = raw.decode(encoding, errors="replace")
+    http_client = _get_http_client("fetch")
+    for _ in range(MAX_REDIRECTS + 1):
+        parsed = urlparse(current_url)
+        # Pooled connections are reused across requests, so every hop is re-checked.
+        addresses = await _assert_safe_fetch_target(parsed)
+        # Fetches run in their own single-flight task, so the pin ends with it.
+        _pinned_addresses.set({_pin_key(parsed.hostname or ""): addresses})
+
+        hop_entry = await _url_content_cache.get(current_url)
+        if hop_entry and hop_entry["url"] != current_url:
+            hop_entry = None
+        if hop_entry and _url_content_cache.is_fresh(hop_entry):
+            await _url_content_cache.put(url, hop_entry)
+            return hop_entry["text"]
+
+        headers = {"User-Agent": "PitchLensBot/1.1"}
+        if hop_entry and hop_entry.get("etag"):
+            headers["If-None-Match"] = hop_entry["etag"]
+        if hop_entry and hop_entry.get("last_modified"):
+            headers["If-Modified-Since"] = hop_entry["last_modified"]
+
+        logger.info("Fetching content from URL: %s", current_url)
+        async with http_client.stream("GET", current_url, headers=headers) as response:
+            if response.status_code == 304 and hop_entry:
+                logger.info("URL content not modified; serving cached text: %s", current_url)
+                hop_entry = {**hop_entry, "fetched_at": time.time()}
+                await _url_content_cache.put(url, hop_entry)
+                return hop_entry["text"]
+
+            if 300 <= response.status_code < 400 and response.headers.get("Location"):
+                next_url = urljoin(current_url, response.headers["Location"])
+                current_url = next_url
+                continue
+
+            response.raise_for_status()
+
+            content_length = response.headers.get("Content-Length")
+            if content_length:
+                try:
+                    if int(content_length) > MAX_FETCH_BYTES:
+                        raise ValueError("Fetched content exceeded size limit.")
+                except ValueError:
+                    raise
+                except Exception:
+                    pass
 
+            content_type = response.headers.get("Content-Type", "").lower()
             if "text/html" in content_type:
-                extracted = _basic_html_to_text(text)
+                extractor: Any = _VisibleTextExtractor(FETCH_TEXT_CHAR_LIMIT)
             else:
-                extracted = re.sub(r"\s+", " ", text).strip()
-
-            if len(extracted) < 50:
-                raise ValueError("Fetched content is too short to analyze.")
-            return extracted
+                extractor = _TextCollector(FETCH_TEXT_CHAR_LIMIT)
+            decoder = _incremental_decoder(response.charset_encoding)
+            total = 0
+            async for chunk in response.aiter_bytes():
+                total += len(chunk)
+                if total > MAX_FETCH_BYTES:
+                    raise ValueError("Fetched content exceeded size limit.")
+                extractor.feed(decoder.decode(chunk))
+                if extractor.done:
+                    # Enough visible text for analysis; stop downloading the rest.
+                    break
+            else:
+                extractor.feed(decoder.decode(b"", final=True))
+            extracted = extractor.close()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        if len(extracted) < 50:
+            raise ValueError("Fetched content is too short to analyze.")
+
+        await _url_content_cache.put(
+            url,
+            {
+                "url": current_url,
+                "text": extracted,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time(),
+            },
+        )
+        return extracted
 
     raise ValueError("Too many redirects.")
 
@@ -577,11 +1438,8 @@ def _fallback_candidates_from_text(text: str) -> List[str]:
     ]
 
 
-def _gemini_request(message: str, tone: str, persona: str):
-    if not client:
-        raise RuntimeError("Gemini client not configured. Check GOOGLE_API_KEY.")
-
-    prompt = f"""
+def _gemini_prompt(message: str, tone: str, persona: str) -> str:
+    return f"""
 {GEMINI_SYSTEM_PROMPT}
 
 Tone: {tone}
@@ -590,7 +1448,117 @@ Persona: {persona}
 Message to analyze:
 {message}
 """
-    return client.models.generate_content(model=GENAI_MODEL, contents=prompt)
+
+
+def _gemini_request(message: str, tone: str, persona: str):
+    if not client:
+        raise RuntimeError("Gemini client not configured. Check GOOGLE_API_KEY.")
+
+    prompt = _gemini_prompt(message, tone, persona)
+    return client.models.generate_content(model=GENAI_MODEL, contents=prompt, config=_gemini_sdk_config())
+
+
+def _gemini_sdk_config() -> Optional[Dict[str, Any]]:
+    if not GEMINI_JSON_MODE:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": GEMINI_RESPONSE_SCHEMA}
+
+
+def _gemini_rest_body(message: str, tone: str, persona: str) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
+        "contents": [{"role": "user", "parts": [{"text": _gemini_prompt(message, tone, persona)}]}]
+    }
+    if GEMINI_JSON_MODE:
+        body["generationConfig"] = {"responseMimeType": "application/json", "responseSchema": GEMINI_RESPONSE_SCHEMA}
+    return body
+
+
+def _get_gemini_limiter() -> anyio.CapacityLimiter:
+    global _gemini_limiter
+    if _gemini_limiter is None:
+        _gemini_limiter = anyio.CapacityLimiter(max(1, GEMINI_MAX_CONCURRENCY))
+    return _gemini_limiter
+
+
+def _gemini_model_path() -> str:
+    return GENAI_MODEL if GENAI_MODEL.startswith("models/") else f"models/{GENAI_MODEL}"
+
+
+def _gemini_response_text(payload: Dict[str, Any]) -> str:
+    candidates = payload.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part["text"] for part in parts if isinstance(part.get("text"), str))
+
+
+async def _gemini_request_async(message: str, tone: str, persona: str) -> str:
+    # google-genai 0.6's `client.aio` is a to_thread wrapper that opens a new
+    # requests.Session per call, so async mode talks to the REST API directly
+    # over a pooled keep-alive client instead.
+    if not GOOGLE_API_KEY:
+        raise RuntimeError("Gemini client not configured. Check GOOGLE_API_KEY.")
+
+    res = await _get_http_client("gemini").post(
+        f"/v1beta/{_gemini_model_path()}:generateContent",
+        headers={"x-goog-api-key": GOOGLE_API_KEY},
+        json=_gemini_rest_body(message, tone, persona),
+    )
+    res.raise_for_status()
+    return _gemini_response_text(res.json())
+
+
+async def _gemini_stream_text(message: str, tone: str, persona: str) -> AsyncIterator[str]:
+    limiter = _get_gemini_limiter()
+    if GEMINI_CLIENT_MODE == "async":
+        if not GOOGLE_API_KEY:
+            raise RuntimeError("Gemini client not configured. Check GOOGLE_API_KEY.")
+        async with limiter:
+            async with _get_http_client("gemini").stream(
+                "POST",
+                f"/v1beta/{_gemini_model_path()}:streamGenerateContent",
+                params={"alt": "sse"},
+                headers={"x-goog-api-key": GOOGLE_API_KEY},
+                json=_gemini_rest_body(message, tone, persona),
+            ) as res:
+                res.raise_for_status()
+                async for line in res.aiter_lines():
+                    if line.startswith("data:"):
+                        yield _gemini_response_text(json.loads(line[5:]))
+        return
+
+    if not client:
+        raise RuntimeError("Gemini client not configured. Check GOOGLE_API_KEY.")
+    # The SDK stream is a lazy generator; each blocking step runs on the Gemini limiter.
+    chunks = client.models.generate_content_stream(
+        model=GENAI_MODEL,
+        contents=_gemini_prompt(message, tone, persona),
+        config=_gemini_sdk_config(),
+    )
+    while True:
+        chunk = await anyio.to_thread.run_sync(next, chunks, None, limiter=limiter)
+        if chunk is None:
+            return
+        yield chunk.text or ""
+
+
+def _gemini_result_from_text(
+    raw_text: str,
+    message: str,
+    tone: str,
+    persona: str,
+) -> Tuple[AnalyzeResponse, Dict[str, Any]]:
+    with time_stage("parse"):
+        data = _extract_json(raw_text)
+        fallback_candidates = _fallback_candidates_from_text(message)
+        return _normalize_analysis_output(
+            data,
+            message=message,
+            tone=tone,
+            persona=persona,
+            source="gemini",
+            fallback_candidates=fallback_candidates,
+        )
 
 
 async def run_gemini_analysis(
@@ -599,20 +1567,21 @@ async def run_gemini_analysis(
     persona: str,
 ) -> Tuple[AnalyzeResponse, Dict[str, Any]]:
     logger.info("Calling Gemini for analysis...")
-    response = await anyio.to_thread.run_sync(_gemini_request, message, tone, persona)
-    raw_text = response.text or ""
-    data = _extract_json(raw_text)
+    limiter = _get_gemini_limiter()
+    with time_stage("gemini"), track_in_flight("gemini"):
+        if GEMINI_CLIENT_MODE == "async":
+            async with limiter:
+                raw_text = await _gemini_request_async(message, tone, persona)
+        else:
+            # A dedicated limiter keeps slow Gemini calls from exhausting anyio's
+            # default thread pool, which sync dependencies such as get_db share.
+            response = await anyio.to_thread.run_sync(
+                _gemini_request, message, tone, persona, limiter=limiter
+            )
+            raw_text = response.text or ""
+    analysis = _gemini_result_from_text(raw_text, message, tone, persona)
     logger.info("Gemini analysis successful")
-
-    fallback_candidates = _fallback_candidates_from_text(message)
-    return _normalize_analysis_output(
-        data,
-        message=message,
-        tone=tone,
-        persona=persona,
-        source="gemini",
-        fallback_candidates=fallback_candidates,
-    )
+    return analysis
 
 
 def run_simple_analysis_with_meta(
@@ -620,7 +1589,10 @@ def run_simple_analysis_with_meta(
     tone: str,
     persona: str,
 ) -> Tuple[AnalyzeResponse, Dict[str, Any]]:
-    text = _sanitize_text(message)
+    return _score_sanitized(_sanitize_text(message), tone, persona)
+
+
+def _score_sanitized(text: str, tone: str, persona: str) -> Tuple[AnalyzeResponse, Dict[str, Any]]:
     lower_text = text.lower()
     length = len(text)
 
@@ -638,20 +1610,7 @@ def run_simple_analysis_with_meta(
         clarity += 5
     clarity = max(0, min(100, clarity))
 
-    positive_words = [
-        "exciting",
-        "amazing",
-        "love",
-        "delighted",
-        "great",
-        "success",
-        "powerful",
-        "win",
-        "thrilled",
-        "fantastic",
-        "wonderful",
-    ]
-    emotional_hits = sum(1 for word in positive_words if word in lower_text)
+    emotional_hits = _count_phrases(lower_text, _EMOTION_WORDS)
 
     if emotional_hits == 0:
         emotion = 55
@@ -668,10 +1627,9 @@ def run_simple_analysis_with_meta(
         emotion += 5
     emotion = max(0, min(100, emotion))
 
-    credibility_words = ["data", "research", "proven", "studies", "statistics", "evidence", "results", "facts"]
-    credibility_hits = sum(1 for word in credibility_words if word in lower_text)
-    has_numbers = any(char.isdigit() for char in text)
-    has_cta = _contains_cta(text)
+    credibility_hits = _count_phrases(lower_text, _CREDIBILITY_WORDS)
+    has_numbers = any(map(str.isdigit, text))
+    has_cta = any(phrase in lower_text for phrase in _CTA_PHRASES)
 
     credibility = 50
     if has_numbers:
@@ -775,46 +1733,174 @@ def run_simple_analysis(message: str, tone: str, persona: str) -> AnalyzeRespons
     return result
 
 
-async def _get_jwks() -> dict:
-    if not CLERK_JWKS_URL:
-        raise RuntimeError("CLERK_JWKS_URL not configured.")
+def score_many(
+    texts: Iterable[str],
+    tone: str,
+    persona: str,
+) -> List[Tuple[AnalyzeResponse, Dict[str, Any]]]:
+    """Score messages that share a tone and persona, in input order.
+
+    Messages that sanitize to the same text are scored once; repeats get
+    their own copies of the result and meta.
+    """
+    scored: Dict[str, Tuple[AnalyzeResponse, Dict[str, Any]]] = {}
+    results: List[Tuple[AnalyzeResponse, Dict[str, Any]]] = []
+    for message in texts:
+        text = _sanitize_text(message)
+        previous = scored.get(text)
+        if previous is None:
+            scored[text] = _score_sanitized(text, tone, persona)
+            results.append(scored[text])
+        else:
+            results.append((previous[0].model_copy(deep=True), copy.deepcopy(previous[1])))
+    return results
+
+
+def _fallback_reason_class(exc: Exception) -> str:
+    """Bucket a Gemini failure into a low-cardinality metrics label."""
+    if not GOOGLE_API_KEY or (GEMINI_CLIENT_MODE == "thread" and client is None):
+        return "not_configured"
+    if isinstance(exc, (httpx.TimeoutException, TimeoutError)):
+        return "timeout"
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "code", None)
+    if status == 429:
+        return "rate_limited"
+    if isinstance(status, int) or isinstance(exc, httpx.HTTPError):
+        return "upstream_error"
+    if isinstance(exc, ValueError):
+        return "invalid_output"
+    return "other"
+
+
+async def _run_analysis(text: str, tone: str, persona: str) -> Tuple[AnalyzeResponse, Dict[str, Any]]:
+    try:
+        analysis = await run_gemini_analysis(text, tone, persona)
+    except Exception as exc:
+        logger.warning("Gemini failed, falling back to deterministic analysis: %s", exc)
+        record_analysis("fallback", _fallback_reason_class(exc))
+        result, analysis_meta = run_simple_analysis_with_meta(text, tone, persona)
+        analysis_meta["fallback_reason"] = str(exc)
+        return result, analysis_meta
+    record_analysis("gemini")
+    return analysis
 
-    now = time.time()
-    cached = _jwks_cache.get("keys")
-    fetched_at = _jwks_cache.get("fetched_at", 0.0)
-    if cached and (now - fetched_at < JWKS_CACHE_TTL):
-        return cached
 
-    async with httpx.AsyncClient(timeout=10.0, trust_env=False) as http_client:
-        res = await http_client.get(CLERK_JWKS_URL)
+def _jwks_retry_delay() -> float:
+    return min(JWKS_RETRY_MAX_BACKOFF, JWKS_RETRY_BACKOFF * 2 ** _jwks_cache["failures"])
+
+
+async def _fetch_jwks() -> dict:
+    try:
+        res = await _get_http_client("jwks").get(CLERK_JWKS_URL)
         res.raise_for_status()
         jwks = res.json()
+    except Exception:
+        # Back off request-triggered refreshes while the endpoint is failing.
+        _jwks_cache["retry_at"] = time.monotonic() + _jwks_retry_delay()
+        _jwks_cache["failures"] += 1
+        raise
+    _jwks_cache["failures"] = 0
 
+    by_kid = {key["kid"]: key for key in jwks.get("keys", []) if key.get("kid")}
+    previous = _jwks_cache["by_kid"]
     _jwks_cache["keys"] = jwks
-    _jwks_cache["fetched_at"] = now
+    _jwks_cache["fetched_at"] = time.time()
+    _jwks_cache["by_kid"] = by_kid
+    # Parsed keys survive a refresh unless their JWK changed.
+    _jwks_cache["key_objects"] = {
+        (kid, alg): key
+        for (kid, alg), key in _jwks_cache["key_objects"].items()
+        if kid in by_kid and by_kid[kid] == previous.get(kid)
+    }
     return jwks
 
 
+async def _refresh_jwks() -> dict:
+    """Fetch the JWKS; concurrent callers share one request."""
+    jwks, _ = await _jwks_flight.do("jwks", _fetch_jwks)
+    return jwks
+
+
+async def _refresh_jwks_quietly() -> None:
+    try:
+        await _refresh_jwks()
+    except Exception as exc:
+        logger.warning("JWKS refresh failed; keeping the cached key set: %s", exc)
+
+
+def _schedule_jwks_refresh() -> None:
+    task = asyncio.ensure_future(_refresh_jwks_quietly())
+    _jwks_refresh_tasks.add(task)
+    task.add_done_callback(_jwks_refresh_tasks.discard)
+
+
+async def _run_jwks_refresher() -> None:
+    while True:
+        await asyncio.sleep(JWKS_REFRESH_INTERVAL)
+        await _refresh_jwks_quietly()
+
+
+async def _get_jwks() -> dict:
+    if not CLERK_JWKS_URL:
+        raise RuntimeError("CLERK_JWKS_URL not configured.")
+
+    cached = _jwks_cache.get("keys")
+    now = time.monotonic()
+    if not cached:
+        if now < _jwks_cache["retry_at"]:
+            raise RuntimeError("JWKS unavailable; waiting to retry.")
+        return await _refresh_jwks()
+    if time.time() - _jwks_cache.get("fetched_at", 0.0) >= JWKS_CACHE_TTL and now >= _jwks_cache["retry_at"]:
+        # Stale-while-revalidate: this request keeps the current keys. At most
+        # one refresh starts per backoff window, whether it succeeds or not.
+        _jwks_cache["retry_at"] = now + _jwks_retry_delay()
+        _schedule_jwks_refresh()
+    return cached
+
+
+async def _get_signing_key(kid: str, alg: str) -> Any:
+    """Return the parsed public key for `kid`.
+
+    An unknown kid triggers at most one JWKS refetch per JWKS_KID_MISS_INTERVAL,
+    so a stream of forged tokens cannot turn into a stream of outbound calls.
+    """
+    await _get_jwks()
+    key = _jwks_cache["key_objects"].get((kid, alg))
+    if key is not None:
+        return key
+
+    key_data = _jwks_cache["by_kid"].get(kid)
+    if not key_data:
+        now = time.monotonic()
+        if now - _jwks_cache["kid_miss_at"] >= JWKS_KID_MISS_INTERVAL:
+            _jwks_cache["kid_miss_at"] = now
+            await _refresh_jwks()
+            key_data = _jwks_cache["by_kid"].get(kid)
+        if not key_data:
+            raise HTTPException(status_code=401, detail="Unable to verify token.")
+
+    key = jwk.construct(key_data, alg)
+    _jwks_cache["key_objects"][(kid, alg)] = key
+    return key
+
+
 async def _verify_token(token: str) -> str:
     if not jwt:
         raise RuntimeError("Auth verification dependency is unavailable.")
 
-    jwks = await _get_jwks()
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    user_id = _verified_tokens.get(token_hash)
+    if user_id:
+        return user_id
+
     headers = jwt.get_unverified_header(token)
     kid = headers.get("kid")
     if not kid:
         raise HTTPException(status_code=401, detail="Invalid token header.")
 
-    keys = jwks.get("keys", [])
-    key = next((k for k in keys if k.get("kid") == kid), None)
-    if not key:
-        _jwks_cache["keys"] = None
-        jwks = await _get_jwks()
-        keys = jwks.get("keys", [])
-        key = next((k for k in keys if k.get("kid") == kid), None)
-        if not key:
-            raise HTTPException(status_code=401, detail="Unable to verify token.")
-
+    alg = headers.get("alg", "RS256")
+    key = await _get_signing_key(kid, alg)
     options = {
         "verify_aud": bool(CLERK_AUDIENCE),
         "verify_iss": bool(CLERK_ISSUER),
@@ -822,7 +1908,7 @@ async def _verify_token(token: str) -> str:
     payload = jwt.decode(
         token,
         key,
-        algorithms=[headers.get("alg", "RS256")],
+        algorithms=[alg],
         issuer=CLERK_ISSUER or None,
         audience=CLERK_AUDIENCE or None,
         options=options,
@@ -830,6 +1916,12 @@ async def _verify_token(token: str) -> str:
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Token missing subject.")
+
+    # Tokens without `exp` are never cached; the rest are dropped AUTH_CLOCK_SKEW
+    # seconds early so a cached `sub` never outlives what jwt.decode would accept.
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        _verified_tokens.set(token_hash, user_id, ttl=exp - time.time() - AUTH_CLOCK_SKEW)
     return user_id
 
 
@@ -848,42 +1940,243 @@ async def get_current_user_id(
         raise HTTPException(status_code=401, detail="Invalid authentication token.")
 
 
-def _enforce_rate_limit(db: Session, key: str) -> None:
+RATE_LIMIT_PERIOD = 60.0
+
+DbSession = Union[Session, AsyncSession]
+
+
+async def _run_db(db: DbSession, fn: Callable[..., Any], *args: Any) -> Any:
+    """Run sync ORM code `fn(session, *args)` against either session flavour.
+
+    With DATABASE_ASYNC the AsyncSession runs `fn` on its sync facade inside a
+    greenlet, so driver IO awaits instead of blocking the event loop. An
+    AsyncSession cannot run operations concurrently, so calls sharing one
+    session (e.g. batch items) are serialized.
+    """
+    if isinstance(db, AsyncSession):
+        lock = db.info.setdefault("run_db_lock", asyncio.Lock())
+        async with lock:
+            return await db.run_sync(fn, *args)
+    return fn(db, *args)
+
+
+def _consume_rate_limit_db(db: Session, key: str, now: float, increment: float) -> bool:
+    """Run one GCRA step for `key` as a single-row read-modify-write.
+
+    The row stores the key's theoretical arrival time (TAT). A request is
+    allowed when pushing the TAT forward by `increment` keeps it within one
+    period of now, which permits bursts of up to RATE_LIMIT_PER_MINUTE.
+    """
+    insert = dialect_insert(db)
+    if insert is not None:
+        table = RateLimitState.__table__
+        new_tat = case((table.c.tat > now, table.c.tat), else_=now) + increment
+        stmt = (
+            insert(table)
+            .values(key=key, tat=now + increment)
+            .on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"tat": new_tat},
+                where=new_tat - now <= RATE_LIMIT_PERIOD,
+            )
+            .returning(table.c.tat)
+        )
+        allowed = db.execute(stmt).first() is not None
+        db.commit()
+        return allowed
+
+    state = db.query(RateLimitState).filter(RateLimitState.key == key).with_for_update().first()
+    new_tat_value = max(state.tat, now) + increment if state else now + increment
+    if new_tat_value - now > RATE_LIMIT_PERIOD:
+        db.rollback()
+        return False
+    if state:
+        state.tat = new_tat_value
+    else:
+        db.add(RateLimitState(key=key, tat=new_tat_value))
+    db.commit()
+    return True
+
+
+class _MemoryRateLimiter:
+    """Sharded in-process GCRA limiter holding one float TAT per key.
+
+    Each shard is an LRU map behind its own lock. Keys whose TAT has passed are
+    indistinguishable from unseen keys, so they are swept from the cold end as
+    new keys arrive; when a shard is still full its least recently used key is
+    evicted.
+    """
+
+    _SWEEP_BATCH = 8
+
+    def __init__(self, max_keys: int, shards: int = 16) -> None:
+        self.max_keys = max_keys
+        self._shard_max_keys = max(1, -(-max_keys // shards))
+        self._shards: List[Tuple[threading.Lock, "OrderedDict[str, float]"]] = [
+            (threading.Lock(), OrderedDict()) for _ in range(shards)
+        ]
+        self.evicted = 0
+
+    def consume(self, key: str, now: float, increment: float, period: float = RATE_LIMIT_PERIOD) -> bool:
+        lock, entries = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            tat = entries.get(key)
+            new_tat = (tat if tat is not None and tat > now else now) + increment
+            if new_tat - now > period:
+                entries.move_to_end(key)
+                return False
+            entries[key] = new_tat
+            entries.move_to_end(key)
+            if tat is None:
+                self._evict(entries, now)
+            return True
+
+    def _evict(self, entries: "OrderedDict[str, float]", now: float) -> None:
+        for _ in range(self._SWEEP_BATCH):
+            oldest_key, oldest_tat = next(iter(entries.items()))
+            if oldest_tat > now:
+                break
+            del entries[oldest_key]
+        while len(entries) > self._shard_max_keys:
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def clear(self) -> None:
+        for lock, entries in self._shards:
+            with lock:
+                entries.clear()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for _, entries in self._shards)
+
+
+_memory_rate_limiter = _MemoryRateLimiter(RATE_LIMIT_MEMORY_MAX_KEYS)
+
+
+async def _enforce_rate_limit(db: DbSession, key: str, cost: int = 1) -> None:
     if RATE_LIMIT_PER_MINUTE <= 0:
         return
 
-    now = int(time.time())
-    window_start = now - 60
-    cleanup_before = now - 3600
+    if cost > RATE_LIMIT_PER_MINUTE:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded.")
+    increment = RATE_LIMIT_PERIOD / RATE_LIMIT_PER_MINUTE * cost
+    now = time.time()
+
+    with time_stage("rate_limit"):
+        if RATE_LIMIT_BACKEND == "db":
+            try:
+                allowed = await _run_db(db, _consume_rate_limit_db, key, now, increment)
+                if not allowed:
+                    raise HTTPException(status_code=429, detail="Rate limit exceeded.")
+                return
+            except HTTPException:
+                raise
+            except Exception as exc:
+                logger.warning("DB rate limit unavailable (%s). Falling back to in-memory limiter.", exc)
+                await _run_db(db, Session.rollback)
+
+        if not _memory_rate_limiter.consume(key, now, increment):
+            raise HTTPException(status_code=429, detail="Rate limit exceeded.")
 
+
+def _prune_expired_rows() -> None:
+    now = time.time()
+    db = SessionLocal()
     try:
-        db.query(RateLimitEvent).filter(RateLimitEvent.ts_epoch < cleanup_before).delete(
+        # A TAT in the past is equivalent to no state at all, so drained keys can go.
+        rate_limit_rows = db.query(RateLimitState).filter(RateLimitState.tat < now).delete(
             synchronize_session=False
         )
-        request_count = (
-            db.query(func.count(RateLimitEvent.id))
-            .filter(RateLimitEvent.key == key, RateLimitEvent.ts_epoch >= window_start)
-            .scalar()
-            or 0
+        cache_rows = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.expires_at_epoch <= now).delete(
+            synchronize_session=False
         )
-        if request_count >= RATE_LIMIT_PER_MINUTE:
-            db.rollback()
-            raise HTTPException(status_code=429, detail="Rate limit exceeded.")
-        db.add(RateLimitEvent(key=key, ts_epoch=now))
         db.commit()
-        return
-    except HTTPException:
-        raise
-    except Exception as exc:
-        logger.warning("DB rate limit unavailable (%s). Falling back to in-memory limiter.", exc)
+        logger.info("Pruned expired rows | rate_limit_state=%d analysis_cache=%d", rate_limit_rows, cache_rows)
+    except Exception:
         db.rollback()
+        raise
+    finally:
+        db.close()
 
-    bucket = _rate_limit_cache.get(key, [])
-    bucket = [timestamp for timestamp in bucket if timestamp >= window_start]
-    if len(bucket) >= RATE_LIMIT_PER_MINUTE:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded.")
-    bucket.append(now)
-    _rate_limit_cache[key] = bucket
+
+async def _run_periodic_pruning() -> None:
+    while True:
+        await asyncio.sleep(DB_PRUNE_INTERVAL)
+        try:
+            await anyio.to_thread.run_sync(_prune_expired_rows)
+        except Exception as exc:
+            logger.warning("Background pruning failed: %s", exc)
+        try:
+            removed = await anyio.to_thread.run_sync(_url_content_cache.sweep_disk)
+            if removed:
+                logger.info("Swept URL disk cache | files=%d", removed)
+        except Exception as exc:
+            logger.warning("URL disk cache sweep failed: %s", exc)
+
+
+def _analysis_cache_key(text: str, tone: str, persona: str) -> str:
+    payload = json.dumps(
+        [_sanitize_text(text), tone, persona, GENAI_MODEL],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _load_cached_analysis(
+    db: DbSession,
+    cache_key: str,
+) -> Optional[Tuple[AnalyzeResponse, Dict[str, Any]]]:
+    if ANALYSIS_CACHE_TTL <= 0:
+        return None
+
+    cached = _analysis_cache.get(cache_key)
+    if cached is None:
+        try:
+            entry = await _run_db(db, Session.get, AnalysisCacheEntry, cache_key)
+        except Exception as exc:
+            logger.warning("Analysis cache lookup failed (%s). Skipping cache.", exc)
+            await _run_db(db, Session.rollback)
+            return None
+        now = time.time()
+        if entry is None or entry.expires_at_epoch <= now:
+            return None
+        cached = (entry.result, entry.analysis_meta)
+        _analysis_cache.set(cache_key, cached, ttl=entry.expires_at_epoch - now)
+
+    result_payload, meta = cached
+    return AnalyzeResponse(**result_payload), copy.deepcopy(meta)
+
+
+def _merge_cache_entry(db: Session, entry: AnalysisCacheEntry) -> None:
+    db.merge(entry)
+    db.commit()
+
+
+async def _store_cached_analysis(
+    db: DbSession,
+    cache_key: str,
+    result: AnalyzeResponse,
+    analysis_meta: Dict[str, Any],
+) -> None:
+    if ANALYSIS_CACHE_TTL <= 0:
+        return
+
+    result_payload = result.model_dump()
+    meta = copy.deepcopy(analysis_meta)
+    _analysis_cache.set(cache_key, (result_payload, meta))
+    entry = AnalysisCacheEntry(
+        cache_key=cache_key,
+        model=GENAI_MODEL,
+        result=result_payload,
+        analysis_meta=meta,
+        expires_at_epoch=int(time.time()) + ANALYSIS_CACHE_TTL,
+    )
+    try:
+        await _run_db(db, _merge_cache_entry, entry)
+    except Exception as exc:
+        logger.warning("Analysis cache write failed (%s). Result cached in memory only.", exc)
+        await _run_db(db, Session.rollback)
 
 
 def _analysis_to_response(analysis: Analysis) -> AnalysisRecordResponse:
@@ -905,28 +2198,11 @@ def _analysis_to_response(analysis: Analysis) -> AnalysisRecordResponse:
     )
 
 
-@app.post("/analyze", response_model=AnalysisRecordResponse)
-async def analyze_message(
-    request: AnalyzeRequest,
-    http_request: Request,
-    db: Session = Depends(get_db),
-    user_id: Optional[str] = Depends(get_current_user_id),
-):
-    if RATE_LIMIT_PER_MINUTE > 0:
-        key = user_id or (http_request.client.host if http_request.client else "anonymous")
-        _enforce_rate_limit(db, key)
-
-    logger.info(
-        "Analyze request received | tone=%s persona=%s has_message=%s has_url=%s",
-        request.tone,
-        request.persona,
-        bool(request.message),
-        bool(request.url),
-    )
+def _rate_limit_key(http_request: Request, user_id: Optional[str]) -> str:
+    return user_id or (http_request.client.host if http_request.client else "anonymous")
 
-    message = (request.message or "").strip()
-    url = (request.url or "").strip()
 
+async def _resolve_analysis_text(message: str, url: str) -> str:
     if not message and not url:
         raise HTTPException(status_code=400, detail="Either message or url must be provided.")
 
@@ -948,18 +2224,38 @@ async def analyze_message(
 
     if len(text) < 10:
         raise HTTPException(status_code=400, detail="Message must be at least 10 characters long.")
-    if len(text) > 2000:
+    if len(text) > MAX_ANALYSIS_CHARS:
         raise HTTPException(
             status_code=400,
-            detail="Message is too long. Please keep it under 2000 characters.",
+            detail=f"Message is too long. Please keep it under {MAX_ANALYSIS_CHARS} characters.",
         )
+    return text
 
-    try:
-        result, analysis_meta = await run_gemini_analysis(text, request.tone, request.persona)
-    except Exception as exc:
-        logger.warning("Gemini failed, falling back to deterministic analysis: %s", exc)
-        result, analysis_meta = run_simple_analysis_with_meta(text, request.tone, request.persona)
-        analysis_meta["fallback_reason"] = str(exc)
+
+async def _analyze_text(
+    db: DbSession,
+    text: str,
+    tone: str,
+    persona: str,
+) -> Tuple[AnalyzeResponse, Dict[str, Any]]:
+    cache_key = _analysis_cache_key(text, tone, persona)
+    with time_stage("cache_lookup"):
+        cached = await _load_cached_analysis(db, cache_key)
+    if cached:
+        result, analysis_meta = cached
+        analysis_meta["cache_hit"] = True
+    else:
+        (result, analysis_meta), shared = await _analysis_flight.do(
+            cache_key,
+            lambda: _run_analysis(text, tone, persona),
+        )
+        analysis_meta = copy.deepcopy(analysis_meta)
+        # Only model output is worth caching; fallback results are cheap and
+        # would pin a degraded answer after a transient Gemini failure.
+        if not shared and analysis_meta.get("source") == "gemini":
+            await _store_cached_analysis(db, cache_key, result, analysis_meta)
+        analysis_meta["cache_hit"] = False
+        analysis_meta["coalesced"] = shared
 
     logger.info(
         "Analysis completed | score=%d clarity=%d emotion=%d credibility=%d market_effectiveness=%d source=%s",
@@ -970,13 +2266,24 @@ async def analyze_message(
         result.market_effectiveness,
         analysis_meta.get("source"),
     )
+    return result, analysis_meta
 
-    analysis = Analysis(
+
+def _build_analysis(
+    user_id: Optional[str],
+    message: str,
+    url: str,
+    tone: str,
+    persona: str,
+    result: AnalyzeResponse,
+    analysis_meta: Dict[str, Any],
+) -> Analysis:
+    return Analysis(
         owner_id=user_id,
         message=message if message else None,
         url=url if url else None,
-        tone=request.tone,
-        persona=request.persona,
+        tone=tone,
+        persona=persona,
         score=result.score,
         clarity=result.clarity,
         emotion=result.emotion,
@@ -986,22 +2293,304 @@ async def analyze_message(
         insights=result.insights,
         analysis_meta=analysis_meta,
     )
-    db.add(analysis)
-    db.commit()
-    db.refresh(analysis)
 
-    return _analysis_to_response(analysis)
 
+@app.post("/analyze", response_model=AnalysisRecordResponse)
+async def analyze_message(
+    request: AnalyzeRequest,
+    http_request: Request,
+    db: DbSession = Depends(get_session),
+    user_id: Optional[str] = Depends(get_current_user_id),
+):
+    if RATE_LIMIT_PER_MINUTE > 0:
+        await _enforce_rate_limit(db, _rate_limit_key(http_request, user_id))
 
-@app.get("/analyses/latest", response_model=AnalysisRecordResponse)
-async def get_latest_analysis(
-    db: Session = Depends(get_db),
+    logger.info(
+        "Analyze request received | tone=%s persona=%s has_message=%s has_url=%s",
+        request.tone,
+        request.persona,
+        bool(request.message),
+        bool(request.url),
+    )
+
+    message = (request.message or "").strip()
+    url = (request.url or "").strip()
+    text = await _resolve_analysis_text(message, url)
+    result, analysis_meta = await _analyze_text(db, text, request.tone, request.persona)
+
+    analysis = _build_analysis(user_id, message, url, request.tone, request.persona, result, analysis_meta)
+    return await _run_db(db, _save_analysis, analysis)
+
+
+def _save_analysis(db: Session, analysis: Analysis) -> AnalysisRecordResponse:
+    return _save_analyses(db, [analysis])[0]
+
+
+def _save_analyses(db: Session, rows: List[Analysis]) -> List[AnalysisRecordResponse]:
+    # One flush inserts every row in a single executemany; eager server
+    # defaults come back via RETURNING, so no per-row refresh is needed.
+    with time_stage("db_insert"):
+        db.add_all(rows)
+        db.flush()
+        apply_rollups(db, rows)
+        records = [_analysis_to_response(row) for row in rows]
+        db.commit()
+    return records
+
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _partial_field(key: str, value: Any) -> Any:
+    if key in ("score", "clarity", "emotion", "credibility", "market_effectiveness"):
+        return _coerce_score(value, default=50)
+    if key == "suggestion":
+        return _sanitize_text(value)[:MAX_SUGGESTION_CHARS] or None
+    if key == "insights":
+        return _normalize_insights(value, []) if isinstance(value, list) and value else None
+    return None
+
+
+async def _analysis_event_stream(
+    db: DbSession,
+    user_id: Optional[str],
+    message: str,
+    url: str,
+    text: str,
+    tone: str,
+    persona: str,
+) -> AsyncIterator[str]:
+    fallback_result, fallback_meta = run_simple_analysis_with_meta(text, tone, persona)
+    yield _sse_event("fallback", {**fallback_result.model_dump(), "analysis_meta": fallback_meta})
+
+    cache_key = _analysis_cache_key(text, tone, persona)
+    with time_stage("cache_lookup"):
+        cached = await _load_cached_analysis(db, cache_key)
+    if cached:
+        result, analysis_meta = cached
+        analysis_meta["cache_hit"] = True
+    else:
+        try:
+            parser = _IncrementalJSONParser()
+            raw_parts: List[str] = []
+            with time_stage("gemini"), track_in_flight("gemini"):
+                async for chunk in _gemini_stream_text(text, tone, persona):
+                    raw_parts.append(chunk)
+                    fields = {}
+                    for key, value in parser.feed(chunk):
+                        partial = _partial_field(key, value)
+                        if partial is not None:
+                            fields[key] = partial
+                    if fields:
+                        yield _sse_event("partial", fields)
+            result, analysis_meta = _gemini_result_from_text("".join(raw_parts), text, tone, persona)
+        except Exception as exc:
+            logger.warning("Gemini stream failed, keeping deterministic analysis: %s", exc)
+            record_analysis("fallback", _fallback_reason_class(exc))
+            result, analysis_meta = fallback_result, fallback_meta
+            analysis_meta["fallback_reason"] = str(exc)
+        else:
+            record_analysis("gemini")
+            await _store_cached_analysis(db, cache_key, result, analysis_meta)
+        analysis_meta["cache_hit"] = False
+
+    try:
+        analysis = _build_analysis(user_id, message, url, tone, persona, result, analysis_meta)
+        record = await _run_db(db, _save_analysis, analysis)
+    except Exception as exc:
+        logger.error("Failed to persist streamed analysis: %s", exc)
+        await _run_db(db, Session.rollback)
+        yield _sse_event("error", {"detail": "Failed to persist analysis."})
+        return
+
+    yield _sse_event("result", record.model_dump(mode="json"))
+
+
+@app.post("/analyze/stream")
+async def analyze_message_stream(
+    request: AnalyzeRequest,
+    http_request: Request,
+    db: DbSession = Depends(get_session),
     user_id: Optional[str] = Depends(get_current_user_id),
 ):
-    query = db.query(Analysis)
+    if RATE_LIMIT_PER_MINUTE > 0:
+        await _enforce_rate_limit(db, _rate_limit_key(http_request, user_id))
+
+    message = (request.message or "").strip()
+    url = (request.url or "").strip()
+    text = await _resolve_analysis_text(message, url)
+
+    return StreamingResponse(
+        _analysis_event_stream(db, user_id, message, url, text, request.tone, request.persona),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/analyze/batch", response_model=AnalyzeBatchResponse)
+async def analyze_batch(
+    batch: AnalyzeBatchRequest,
+    http_request: Request,
+    db: DbSession = Depends(get_session),
+    user_id: Optional[str] = Depends(get_current_user_id),
+):
+    item_count = len(batch.items)
+    if item_count == 0:
+        raise HTTPException(status_code=400, detail="At least one item must be provided.")
+    if item_count > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch is too large. Please submit at most {BATCH_MAX_ITEMS} items.",
+        )
+    if RATE_LIMIT_PER_MINUTE > 0:
+        await _enforce_rate_limit(db, _rate_limit_key(http_request, user_id), cost=item_count)
+
+    logger.info("Batch analyze request received | items=%d", item_count)
+    semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+
+    async def analyze_item(item: AnalyzeRequest) -> Analysis:
+        async with semaphore:
+            message = (item.message or "").strip()
+            url = (item.url or "").strip()
+            text = await _resolve_analysis_text(message, url)
+            result, analysis_meta = await _analyze_text(db, text, item.tone, item.persona)
+            return _build_analysis(user_id, message, url, item.tone, item.persona, result, analysis_meta)
+
+    outcomes = await asyncio.gather(
+        *(analyze_item(item) for item in batch.items),
+        return_exceptions=True,
+    )
+
+    rows = [outcome for outcome in outcomes if isinstance(outcome, Analysis)]
+    records: List[AnalysisRecordResponse] = []
+    if rows:
+        records = await _run_db(db, _save_analyses, rows)
+
+    items: List[AnalyzeBatchItemResult] = []
+    record_iter = iter(records)
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, Analysis):
+            items.append(AnalyzeBatchItemResult(index=index, status_code=200, record=next(record_iter)))
+        elif isinstance(outcome, HTTPException):
+            items.append(AnalyzeBatchItemResult(index=index, status_code=outcome.status_code, error=outcome.detail))
+        else:
+            logger.error("Batch item %d failed: %s", index, outcome)
+            items.append(AnalyzeBatchItemResult(index=index, status_code=500, error="Analysis failed."))
+
+    return AnalyzeBatchResponse(
+        succeeded=len(records),
+        failed=item_count - len(records),
+        items=items,
+    )
+
+
+def _owned_analyses(db: Session, user_id: Optional[str], *entities: Any):
+    query = db.query(*(entities or (Analysis,)))
     if user_id:
         query = query.filter(Analysis.owner_id == user_id)
-    analysis = query.order_by(Analysis.created_at.desc()).first()
+    return query
+
+
+# Columns for view=summary; everything else (text, insights, meta JSON) stays unread.
+_SUMMARY_COLUMNS = tuple(getattr(Analysis, name) for name in AnalysisSummaryResponse.model_fields)
+
+# Newest first, with id breaking created_at ties; matches ix_analyses_owner_created_at_id.
+_RECENT_ORDER = (Analysis.created_at.desc(), Analysis.id.desc())
+
+
+def _encode_cursor(analysis: Analysis) -> str:
+    payload = json.dumps([analysis.created_at.isoformat(), analysis.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, analysis_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def _query_latest_analysis(db: Session, user_id: Optional[str]) -> Optional[Analysis]:
+    return _owned_analyses(db, user_id).order_by(*_RECENT_ORDER).first()
+
+
+def _query_analysis(db: Session, analysis_id: int, user_id: Optional[str]) -> Optional[Analysis]:
+    return _owned_analyses(db, user_id).filter(Analysis.id == analysis_id).first()
+
+
+def _query_archived_analysis(db: Session, analysis_id: int, user_id: Optional[str]) -> Optional[ArchivedAnalysis]:
+    query = db.query(ArchivedAnalysis).filter(ArchivedAnalysis.id == analysis_id)
+    if user_id:
+        query = query.filter(ArchivedAnalysis.owner_id == user_id)
+    return query.first()
+
+
+def _recent_analyses_query(
+    db: Session,
+    user_id: Optional[str],
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    columns: Tuple[Any, ...] = (),
+):
+    query = _owned_analyses(db, user_id, *columns)
+    if before is not None:
+        before_created_at, before_id = before
+        # Seek from the cursor row's stored timestamp so the comparison uses the
+        # column's own representation; the encoded value covers deleted rows.
+        # Only the caller's own rows may anchor the seek, so another owner's id
+        # cannot reveal that row's timestamp.
+        anchor_query = select(Analysis.created_at).where(Analysis.id == before_id)
+        if user_id:
+            anchor_query = anchor_query.where(Analysis.owner_id == user_id)
+        anchor = func.coalesce(anchor_query.scalar_subquery(), before_created_at)
+        query = query.filter(tuple_(Analysis.created_at, Analysis.id) < tuple_(anchor, before_id))
+    return query.order_by(*_RECENT_ORDER).limit(limit)
+
+
+def _query_recent_analyses(
+    db: Session,
+    user_id: Optional[str],
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    columns: Tuple[Any, ...] = (),
+) -> List[Any]:
+    return _recent_analyses_query(db, user_id, limit, before, columns).all()
+
+
+# Declared before /analyses/{analysis_id} so "stats" is not parsed as an id.
+@app.get("/analyses/stats", response_model=AnalysisStatsResponse)
+async def get_analysis_stats(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month"] = "day",
+    tone: Optional[str] = None,
+    persona: Optional[str] = None,
+    db: DbSession = Depends(get_session),
+    user_id: Optional[str] = Depends(get_current_user_id),
+):
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+
+    rows = await _run_db(db, query_rollups, user_id, start, end, tone, persona)
+    return AnalysisStatsResponse(
+        granularity=granularity,
+        start=start,
+        end=end,
+        buckets=summarize_rollups(rows, granularity),
+    )
+
+
+@app.get("/analyses/latest", response_model=AnalysisRecordResponse)
+async def get_latest_analysis(
+    db: DbSession = Depends(get_session),
+    user_id: Optional[str] = Depends(get_current_user_id),
+):
+    analysis = await _run_db(db, _query_latest_analysis, user_id)
     if not analysis:
         raise HTTPException(status_code=404, detail="No analyses found.")
     return _analysis_to_response(analysis)
@@ -1010,32 +2599,83 @@ async def get_latest_analysis(
 @app.get("/analyses/{analysis_id}", response_model=AnalysisRecordResponse)
 async def get_analysis(
     analysis_id: int,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_session),
     user_id: Optional[str] = Depends(get_current_user_id),
 ):
-    query = db.query(Analysis).filter(Analysis.id == analysis_id)
-    if user_id:
-        query = query.filter(Analysis.owner_id == user_id)
-    analysis = query.first()
-    if not analysis:
+    analysis = await _run_db(db, _query_analysis, analysis_id, user_id)
+    if analysis:
+        return _analysis_to_response(analysis)
+
+    archived = await _run_db(db, _query_archived_analysis, analysis_id, user_id)
+    if not archived:
         raise HTTPException(status_code=404, detail="Analysis not found.")
-    return _analysis_to_response(analysis)
+    try:
+        record = await anyio.to_thread.run_sync(
+            read_archived_record, archived.segment, archived.byte_offset, archived.line_number
+        )
+    except (OSError, ValueError, IndexError) as exc:
+        logger.error("Archived analysis %d unreadable: %s", analysis_id, exc)
+        raise HTTPException(status_code=404, detail="Analysis not found.")
+    return AnalysisRecordResponse(**record)
 
 
-@app.get("/analyses", response_model=List[AnalysisRecordResponse])
+@app.get(
+    "/analyses",
+    response_model=Union[List[AnalysisRecordResponse], List[AnalysisSummaryResponse]],
+)
 async def list_analyses(
+    response: Response,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    before: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    db: DbSession = Depends(get_session),
     user_id: Optional[str] = Depends(get_current_user_id),
 ):
     safe_limit = max(1, min(limit, 100))
-    query = db.query(Analysis)
-    if user_id:
-        query = query.filter(Analysis.owner_id == user_id)
-    analyses = query.order_by(Analysis.created_at.desc()).limit(safe_limit).all()
+    seek = _decode_cursor(before) if before else None
+    columns = _SUMMARY_COLUMNS if view == "summary" else ()
+    # One extra row tells us whether another page exists without a COUNT.
+    analyses = await _run_db(db, _query_recent_analyses, user_id, safe_limit + 1, seek, columns)
+    if len(analyses) > safe_limit:
+        analyses = analyses[:safe_limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(analyses[-1])
+    if view == "summary":
+        return [AnalysisSummaryResponse(**row._asdict()) for row in analyses]
     return [_analysis_to_response(item) for item in analyses]
 
 
+@app.get("/stats")
+async def get_stats(_: Optional[str] = Depends(get_current_user_id)):
+    return {
+        "singleflight": {
+            "analysis": _analysis_flight.stats(),
+            "url_fetch": _url_fetch_flight.stats(),
+        },
+        "http_pools": _http_pool_stats(),
+        "db_pools": pool_stats(),
+        "rate_limiter": {
+            "backend": RATE_LIMIT_BACKEND,
+            "memory_keys": len(_memory_rate_limiter),
+            "memory_evicted": _memory_rate_limiter.evicted,
+        },
+        "auth": {
+            "verified_tokens": len(_verified_tokens),
+            "jwks_keys": len(_jwks_cache["by_kid"]),
+            "jwks_age_seconds": round(time.time() - _jwks_cache["fetched_at"], 1) if _jwks_cache["keys"] else None,
+            "jwks_refreshes": _jwks_flight.stats(),
+            "jwks_failures": _jwks_cache["failures"],
+        },
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "version": "1.1.0", "env": APP_ENV}
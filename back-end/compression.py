@@ -0,0 +1,136 @@
+"""Compact at-rest encoding for large analysis text and JSON columns.
+
+Compressed values start with a two-byte header: MAGIC, then a codec id. 0xC1
+can never begin valid UTF-8, so plain UTF-8 values are told apart and decoded
+as-is. Values written before compression are plain, and so is everything
+written with DB_COMPRESSION=none or that compression would not shrink.
+
+Both codecs are primed with a preset dictionary of the boilerplate the
+deterministic analyzer and Gemini responses repeat on every row. The dictionary
+is part of the stored format: never edit _DICTIONARY_V1, add a new codec id
+with a new dictionary instead.
+"""
+
+import logging
+import os
+import zlib
+from typing import Optional, Union
+
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger("pitchlens.compression")
+
+MAGIC = 0xC1
+CODEC_RAW = 0x00
+CODEC_ZLIB_V1 = 0x01
+CODEC_ZSTD_V1 = 0x02
+
+# Values shorter than this rarely shrink enough to pay for the header.
+MIN_COMPRESS_BYTES = 64
+
+_DICTIONARY_V1 = "".join(
+    [
+        '"target_audience": "Not specified", "primary_intent": "Not specified", ',
+        '"core_claims": [], "gaps": [], "risks": [], ',
+        "Message may be perceived as generic without evidence. ",
+        "Insufficient quantified proof. ",
+        "Clarity is too low. Lead with one clear value proposition before adding details. ",
+        "The message is too long. Remove non-essential phrases and keep one primary narrative. ",
+        "Credibility is limited. Add one measurable result with timeframe and baseline. ",
+        "Trust signals are weak. Reference evidence, research, or customer results explicitly. ",
+        "Emotional resonance is weak. Add language that makes the outcome feel urgent and relevant. ",
+        "No clear call-to-action. End with a concrete next step (meeting, trial, reply, or signup). ",
+        "Structure can improve. Break the message into benefit, proof, and action. ",
+        "Add one quantified result with timeframe and baseline. ",
+        "Support your core claim with a real customer case or benchmark. ",
+        "State the exact next step and expected business outcome. ",
+        "Backed by measurable outcomes, including a concrete metric and timeframe. ",
+        "The outcome is meaningful and immediately relevant to decision-makers. ",
+        "If this aligns with your goals, take the next step today. ",
+        "Backed by measurable outcomes and clear proof points. ",
+        "The outcome is meaningful for teams that need faster, more reliable results. ",
+        "Would you be open to a 15-minute call this week to evaluate fit? ",
+        '{"source": "gemini", "model": "gemini-2.5-flash", "confidence": 0.7, ',
+        '{"source": "fallback", "model": "deterministic-v2", "confidence": 0.45, ',
+        '"tone": "professional", "persona": "expert", "tone": "casual", "persona": "friendly", ',
+        '"diagnostics": {"target_audience": "General business audience", ',
+        '"primary_intent": "Persuade and drive action", "core_claims": [',
+        '"gaps": ["Missing explicit CTA", "Emotional resonance is limited"], ',
+        '"risks": ["Evidence may still need stronger context."]}, "rewrite_options": [',
+        '"Outcome-first variant: Start with measurable impact, then explain why it matters now.", ',
+        '"Trust-first variant: Open with evidence and customer result before the core pitch."], ',
+        '"evidence_needs": ["Add one concrete metric with baseline and timeframe.", ',
+        '"Mention source of proof (case study, benchmark, or internal data).", ',
+        '"Define the exact next step and expected business value."], ',
+        '"fallback_reason": "", "cache_hit": false, "coalesced": false}',
+    ]
+).encode("utf-8")
+
+# Read at import time, which can come before app.py loads .env.
+load_dotenv()
+DB_COMPRESSION = os.getenv("DB_COMPRESSION", "zlib").strip().lower()
+
+_zstd_dict = None
+if zstandard is not None:
+    _zstd_dict = zstandard.ZstdCompressionDict(_DICTIONARY_V1, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+    _zstd_dict.precompute_compress(level=6)
+
+
+def _write_codec() -> int:
+    if DB_COMPRESSION == "zstd":
+        if zstandard is not None:
+            return CODEC_ZSTD_V1
+        logger.warning("DB_COMPRESSION=zstd but zstandard is not installed. Using zlib.")
+        return CODEC_ZLIB_V1
+    if DB_COMPRESSION == "none":
+        return CODEC_RAW
+    return CODEC_ZLIB_V1
+
+
+def _compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD_V1:
+        return zstandard.ZstdCompressor(level=6, dict_data=_zstd_dict).compress(data)
+    compressor = zlib.compressobj(level=6, zdict=_DICTIONARY_V1)
+    return compressor.compress(data) + compressor.flush()
+
+
+def encode_text(value: str, codec: Optional[int] = None) -> bytes:
+    """Encode text for storage, falling back to plain UTF-8 when compression is off or does not help."""
+    codec = _write_codec() if codec is None else codec
+    data = value.encode("utf-8")
+    if codec != CODEC_RAW and len(data) >= MIN_COMPRESS_BYTES:
+        packed = _compress(data, codec)
+        if len(packed) < len(data):
+            return bytes((MAGIC, codec)) + packed
+    return data
+
+
+def is_encoded(value: Union[bytes, bytearray, memoryview, str, None]) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and len(value) >= 2 and value[0] == MAGIC
+
+
+def decode_text(value: Union[bytes, bytearray, memoryview, str]) -> str:
+    """Decode a stored value; plain text written before compression passes through."""
+    if isinstance(value, str):
+        return value
+    data = bytes(value)
+    if not is_encoded(data):
+        return data.decode("utf-8")
+
+    codec, payload = data[1], data[2:]
+    # Headered raw values are no longer written but may already be stored.
+    if codec == CODEC_RAW:
+        return payload.decode("utf-8")
+    if codec == CODEC_ZLIB_V1:
+        decompressor = zlib.decompressobj(zdict=_DICTIONARY_V1)
+        return (decompressor.decompress(payload) + decompressor.flush()).decode("utf-8")
+    if codec == CODEC_ZSTD_V1:
+        if zstandard is None:
+            raise RuntimeError("Stored value is zstd-compressed but zstandard is not installed.")
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dict).decompress(payload).decode("utf-8")
+    raise ValueError(f"Unknown compression codec {codec:#04x}.")
@@ -1,16 +1,180 @@
 import os
-from sqlalchemy import create_engine, inspect, text
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import LargeBinary, create_engine, event, inspect, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
+# Read at import time, which comes before app.py loads .env.
+load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./pitchlens.db")
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").strip().lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").strip().lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
 
 connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+
+class _PoolTimingMixin:
+    """Records how long checkouts wait for a connection and how often they time out."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._timing_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with self._timing_lock:
+                self.checkout_timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        with self._timing_lock:
+            self.checkouts += 1
+            self.checkout_wait_total += waited
+            self.checkout_wait_max = max(self.checkout_wait_max, waited)
+        return connection
+
+    def stats(self) -> Dict[str, Any]:
+        with self._timing_lock:
+            checkouts = self.checkouts
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": max(0, self.overflow()),
+                "max_overflow": self._max_overflow,
+                "checkouts": checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait_avg_ms": round(self.checkout_wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+            }
+
+
+class TimedQueuePool(_PoolTimingMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_PoolTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def _engine_options(url: URL, pool_class: type) -> Dict[str, Any]:
+    # In-memory SQLite lives inside a single connection, so it keeps the
+    # dialect's default singleton/static pool.
+    if _is_sqlite_memory(url):
+        return {}
+    return {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    # WAL lets readers proceed while the (rate-limit heavy) writer commits;
+    # NORMAL sync is durable across application crashes under WAL.
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+
+def _configure_engine(sync_engine) -> None:
+    if sync_engine.dialect.name == "sqlite" and not _is_sqlite_memory(sync_engine.url):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+
+_database_url = make_url(DATABASE_URL)
+engine = create_engine(_database_url, connect_args=connect_args, **_engine_options(_database_url, TimedQueuePool))
+_configure_engine(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "psycopg"}
+
+
+def async_database_url(url: str) -> URL:
+    """Map a sync DATABASE_URL onto the matching asyncio driver."""
+    parsed = make_url(url)
+    if parsed.get_driver_name() in ("aiosqlite", "asyncpg", "psycopg"):
+        return parsed
+    backend = parsed.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise RuntimeError(f"DATABASE_ASYNC is not supported for '{backend}' databases.")
+    return parsed.set(drivername=f"{backend}+{driver}")
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_url = async_database_url(DATABASE_URL)
+    async_engine = create_async_engine(
+        _async_url,
+        connect_args=connect_args,
+        **_engine_options(_async_url, TimedAsyncAdaptedQueuePool),
+    )
+    _configure_engine(async_engine.sync_engine)
+    # Rows are read after commit outside the greenlet, so they must not expire.
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+def dialect_insert(db) -> Optional[Callable[..., Any]]:
+    """Return the dialect INSERT construct supporting ON CONFLICT, if any."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def pool_stats() -> Dict[str, Optional[Dict[str, Any]]]:
+    """Occupancy and checkout-wait counters for the sync and async engine pools."""
+
+    def describe(pool) -> Optional[Dict[str, Any]]:
+        return pool.stats() if isinstance(pool, _PoolTimingMixin) else None
+
+    return {
+        "sync": describe(engine.pool),
+        "async": describe(async_engine.pool) if async_engine is not None else None,
+    }
+
 
 class Base(DeclarativeBase):
     pass
@@ -20,6 +184,9 @@ def init_db() -> None:
     Base.metadata.create_all(bind=engine)
     _ensure_owner_column()
     _ensure_analysis_meta_column()
+    _ensure_recent_index()
+    _ensure_sqlite_autoincrement()
+    _ensure_compressed_columns()
 
 
 def _ensure_owner_column() -> None:
@@ -54,9 +221,87 @@ def _ensure_analysis_meta_column() -> None:
         conn.execute(text("ALTER TABLE analyses ADD COLUMN analysis_meta JSON"))
 
 
+def _ensure_recent_index() -> None:
+    inspector = inspect(engine)
+    if "analyses" not in inspector.get_table_names():
+        return
+    indexes = {idx.get("name") for idx in inspector.get_indexes("analyses")}
+    with engine.begin() as conn:
+        if "ix_analyses_owner_created_at_id" not in indexes:
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_analyses_owner_created_at_id "
+                    "ON analyses (owner_id, created_at DESC, id DESC)"
+                )
+            )
+        # The primary key is already indexed; older schemas carried a duplicate.
+        if "ix_analyses_id" in indexes:
+            conn.execute(text("DROP INDEX IF EXISTS ix_analyses_id"))
+
+
+def _ensure_compressed_columns() -> None:
+    """Refuse to start against text/json columns that migration 0008 has not converted yet.
+
+    SQLite stores the binary values in its declared TEXT/JSON columns as-is;
+    other databases need the column types changed (and existing rows
+    compressed in batches), which is left to the migration.
+    """
+    if engine.dialect.name == "sqlite":
+        return
+    inspector = inspect(engine)
+    if "analyses" not in inspector.get_table_names():
+        return
+    stale = [
+        col["name"]
+        for col in inspector.get_columns("analyses")
+        if col["name"] in ("message", "suggestion", "analysis_meta") and not isinstance(col["type"], LargeBinary)
+    ]
+    if stale:
+        raise RuntimeError(
+            f"analyses.{', analyses.'.join(stale)} still use the uncompressed column types; "
+            "run `alembic upgrade head` (migration 20261017_0008) before starting the API."
+        )
+
+
+def _ensure_sqlite_autoincrement() -> None:
+    """Rebuild a pre-AUTOINCREMENT SQLite `analyses` table so deleted ids are never reused."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        table_sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'analyses'")
+        ).scalar()
+        if not table_sql or "AUTOINCREMENT" in table_sql.upper():
+            return
+        table = Base.metadata.tables["analyses"]
+        old_columns = {col["name"] for col in inspect(conn).get_columns("analyses")}
+        columns = ", ".join(col.name for col in table.columns if col.name in old_columns)
+        for index in inspect(conn).get_indexes("analyses"):
+            conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+        conn.execute(text("ALTER TABLE analyses RENAME TO _analyses_rebuild"))
+        table.create(conn)
+        conn.execute(text(f"INSERT INTO analyses ({columns}) SELECT {columns} FROM _analyses_rebuild"))
+        conn.execute(text("DROP TABLE _analyses_rebuild"))
+        # Ids already archived (and possibly reused before this rebuild) stay retired.
+        conn.execute(
+            text(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM archived_analyses)) "
+                "WHERE name = 'analyses'"
+            )
+        )
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+get_session = get_async_db if DATABASE_ASYNC else get_db
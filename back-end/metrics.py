@@ -0,0 +1,157 @@
+"""Prometheus metrics for the API, exposed on GET /metrics.
+
+Metrics live in the default registry of each process. With several uvicorn
+workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory shared by all
+of them (wipe it before the server starts); every worker then writes its
+samples there and /metrics aggregates them whichever worker answers.
+
+Without prometheus-client installed the Prometheus side is a no-op, but
+stage timings still reach the per-request timing context: the request
+middleware opens it, `time_stage` fills it in, and the middleware turns it into
+a Server-Timing header and the timings on the access log line.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Settings below (and prometheus_client itself, for PROMETHEUS_MULTIPROC_DIR)
+# are read at import time, which can come before app.py loads .env.
+load_dotenv()
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    Counter = None
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes") and Counter is not None
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "").strip()
+
+STAGES = ("dns", "url_fetch", "cache_lookup", "gemini", "parse", "rate_limit", "db_insert")
+# Sub-millisecond stages (rate limit, parse) up to slow Gemini calls.
+_STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+if METRICS_ENABLED:
+    REQUEST_DURATION = Histogram(
+        "pitchlens_http_request_duration_seconds",
+        "HTTP request latency by route template.",
+        ("method", "route"),
+        buckets=_REQUEST_BUCKETS,
+    )
+    REQUESTS = Counter(
+        "pitchlens_http_requests",
+        "HTTP responses by route template and status code.",
+        ("method", "route", "status"),
+    )
+    STAGE_DURATION = Histogram(
+        "pitchlens_stage_duration_seconds",
+        "Latency of individual pipeline stages.",
+        ("stage",),
+        buckets=_STAGE_BUCKETS,
+    )
+    ANALYSES = Counter(
+        "pitchlens_analyses",
+        "Analyses produced by Gemini or the deterministic fallback, by fallback reason class.",
+        ("source", "fallback_reason"),
+    )
+    IN_FLIGHT = Gauge(
+        "pitchlens_in_flight",
+        "Work currently in progress: HTTP requests, Gemini calls, and URL fetches.",
+        ("kind",),
+        multiprocess_mode="livesum",
+    )
+    # Pre-create label sets so dashboards see zeros instead of gaps.
+    for _stage in STAGES:
+        STAGE_DURATION.labels(_stage)
+    for _kind in ("http", "gemini", "url_fetch"):
+        IN_FLIGHT.labels(_kind)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    if METRICS_ENABLED:
+        REQUEST_DURATION.labels(method, route).observe(seconds)
+        REQUESTS.labels(method, route, str(status)).inc()
+
+
+# Stage name -> seconds spent in it during the current request. Tasks and
+# worker threads started by the request copy the context, so they add to the
+# same dict; concurrent stages (batch items) are summed.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def request_timings() -> Iterator[Dict[str, float]]:
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def format_server_timing(timings: Dict[str, float], total: float) -> str:
+    """Render timings as a Server-Timing header value (durations in ms)."""
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    return ",".join(f"{stage}:{seconds * 1000:.1f}ms" for stage, seconds in timings.items()) or "-"
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+    if METRICS_ENABLED:
+        STAGE_DURATION.labels(stage).observe(seconds)
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block (sync or async code) into the stage histogram and request timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def track_in_flight(kind: str) -> Iterator[None]:
+    if not METRICS_ENABLED:
+        yield
+        return
+    gauge = IN_FLIGHT.labels(kind)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+def record_analysis(source: str, fallback_reason: Optional[str] = None) -> None:
+    if METRICS_ENABLED:
+        ANALYSES.labels(source, fallback_reason or "none").inc()
+
+
+def render() -> Tuple[bytes, str]:
+    """Return the exposition body and its content type."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the shared multiprocess directory."""
+    if METRICS_ENABLED and PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
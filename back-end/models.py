@@ -1,15 +1,44 @@
-from sqlalchemy import Column, DateTime, Integer, JSON, String, Text
+import json
+
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, Index, Integer, JSON, LargeBinary, String, Text
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 
+from compression import decode_text, encode_text
 from db import Base
 
 
+class CompressedText(TypeDecorator):
+    """Text stored through `compression.encode_text`; legacy plain values still read."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else encode_text(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decode_text(value)
+
+
+class CompressedJSON(CompressedText):
+    """JSON document stored as compressed UTF-8 text."""
+
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else encode_text(json.dumps(value, ensure_ascii=False))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else json.loads(decode_text(value))
+
+
 class Analysis(Base):
     __tablename__ = "analyses"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     owner_id = Column(String(128), index=True, nullable=True)
-    message = Column(Text, nullable=True)
+    message = Column(CompressedText, nullable=True)
     url = Column(Text, nullable=True)
     tone = Column(String(32), nullable=False)
     persona = Column(String(32), nullable=False)
@@ -18,16 +47,75 @@ class Analysis(Base):
     emotion = Column(Integer, nullable=False)
     credibility = Column(Integer, nullable=False)
     market_effectiveness = Column(Integer, nullable=False)
-    suggestion = Column(Text, nullable=False)
+    suggestion = Column(CompressedText, nullable=False)
     insights = Column(JSON, nullable=False)
-    analysis_meta = Column(JSON, nullable=True)
+    analysis_meta = Column(CompressedJSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    # Fetch server-generated columns with RETURNING so bulk inserts need no refresh.
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # Serves the per-owner newest-first listing and its (created_at, id) keyset seeks.
+        Index("ix_analyses_owner_created_at_id", owner_id, created_at.desc(), id.desc()),
+        # Archived ids live on in archived_analyses, so SQLite must never reuse them.
+        {"sqlite_autoincrement": True},
+    )
 
-class RateLimitEvent(Base):
-    __tablename__ = "rate_limit_events"
 
-    id = Column(Integer, primary_key=True, index=True)
-    key = Column(String(255), index=True, nullable=False)
-    ts_epoch = Column(Integer, index=True, nullable=False)
+class RateLimitState(Base):
+    __tablename__ = "rate_limit_state"
+
+    key = Column(String(255), primary_key=True)
+    tat = Column(Float, index=True, nullable=False)
+
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    model = Column(String(128), nullable=False)
+    result = Column(JSON, nullable=False)
+    analysis_meta = Column(JSON, nullable=False)
+    expires_at_epoch = Column(Integer, index=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class AnalysisRollup(Base):
+    __tablename__ = "analysis_rollups"
+
+    # Empty string stands in for unowned analyses; primary key columns cannot be NULL.
+    owner_key = Column(String(128), primary_key=True)
+    day = Column(Date, primary_key=True)
+    tone = Column(String(32), primary_key=True)
+    persona = Column(String(32), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    gemini_count = Column(Integer, nullable=False, default=0)
+    fallback_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False)
+    score_min = Column(Integer, nullable=False)
+    score_max = Column(Integer, nullable=False)
+    clarity_sum = Column(Integer, nullable=False)
+    clarity_min = Column(Integer, nullable=False)
+    clarity_max = Column(Integer, nullable=False)
+    emotion_sum = Column(Integer, nullable=False)
+    emotion_min = Column(Integer, nullable=False)
+    emotion_max = Column(Integer, nullable=False)
+    credibility_sum = Column(Integer, nullable=False)
+    credibility_min = Column(Integer, nullable=False)
+    credibility_max = Column(Integer, nullable=False)
+    market_effectiveness_sum = Column(Integer, nullable=False)
+    market_effectiveness_min = Column(Integer, nullable=False)
+    market_effectiveness_max = Column(Integer, nullable=False)
+
+
+class ArchivedAnalysis(Base):
+    __tablename__ = "archived_analyses"
+
+    # Same id the row had in `analyses`; points at its line in a JSONL segment.
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    owner_id = Column(String(128), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    segment = Column(String(512), nullable=False)
+    byte_offset = Column(BigInteger, nullable=False)
+    line_number = Column(Integer, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,234 @@
+"""Retention job: archive old analyses to gzip JSONL segments, then delete them.
+
+Rows older than RETENTION_DAYS, or beyond the newest RETENTION_MAX_PER_OWNER
+rows of an owner, are streamed out in (created_at, id) order through a
+server-side cursor. They land in ARCHIVE_DIR/YYYY/MM/DD/analyses-<run>.jsonl.gz
+(partitioned by UTC creation day), are indexed in `archived_analyses`, and are
+finally deleted from `analyses` in chunked batches.
+
+Each segment is a sequence of independent gzip members of up to BLOCK_ROWS
+lines, so a single archived record can be read by seeking to its member.
+
+    python retention.py [--days N] [--max-per-owner N] [--dry-run]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import uuid
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from db import engine as default_engine
+from models import Analysis, ArchivedAnalysis
+from rollups import rollup_day
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive").strip()
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "0"))
+RETENTION_MAX_PER_OWNER = int(os.getenv("RETENTION_MAX_PER_OWNER", "0"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+BLOCK_ROWS = 128
+
+
+class _SegmentWriter:
+    """Appends JSONL lines to one day's segment as gzip members of up to BLOCK_ROWS lines."""
+
+    def __init__(self, root: str, day: date, run_id: str) -> None:
+        self.segment = os.path.join(f"{day:%Y}", f"{day:%m}", f"{day:%d}", f"analyses-{run_id}.jsonl.gz")
+        path = os.path.join(root, self.segment)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "xb")
+        self._lines: List[bytes] = []
+        self._rows: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self._lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self._rows.append(record)
+        return self.flush() if len(self._lines) >= BLOCK_ROWS else []
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Write buffered lines as one gzip member; return index entries for them."""
+        if not self._lines:
+            return []
+        byte_offset = self._file.tell()
+        self._file.write(gzip.compress(b"\n".join(self._lines) + b"\n", mtime=0))
+        entries = [
+            {
+                "id": record["id"],
+                "owner_id": record["owner_id"],
+                "created_at": datetime.fromisoformat(record["created_at"]),
+                "segment": self.segment,
+                "byte_offset": byte_offset,
+                "line_number": line_number,
+            }
+            for line_number, record in enumerate(self._rows)
+        ]
+        self._lines, self._rows = [], []
+        return entries
+
+    def sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _serialize(row: Any) -> Dict[str, Any]:
+    record = dict(row._mapping)
+    record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+def _retention_condition(bind: Engine, max_age_days: int, max_per_owner: int) -> Optional[Any]:
+    conditions = []
+    if max_age_days > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+        if bind.dialect.name == "sqlite":
+            # SQLite stores naive UTC timestamps; compare like with like.
+            cutoff = cutoff.replace(tzinfo=None)
+        conditions.append(Analysis.created_at < cutoff)
+    if max_per_owner > 0:
+        ranked = (
+            select(
+                Analysis.id,
+                func.row_number()
+                .over(
+                    partition_by=Analysis.owner_id,
+                    order_by=(Analysis.created_at.desc(), Analysis.id.desc()),
+                )
+                .label("owner_rank"),
+            )
+            .where(Analysis.owner_id.isnot(None))
+            .subquery()
+        )
+        conditions.append(Analysis.id.in_(select(ranked.c.id).where(ranked.c.owner_rank > max_per_owner)))
+    return or_(*conditions) if conditions else None
+
+
+def _finish_interrupted_run(session: Session, batch_size: int) -> int:
+    """Delete rows an earlier run archived and indexed but did not get to delete."""
+    deleted = 0
+    while True:
+        ids = [
+            row_id
+            for (row_id,) in session.query(Analysis.id)
+            .join(ArchivedAnalysis, ArchivedAnalysis.id == Analysis.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return deleted
+        deleted += session.query(Analysis).filter(Analysis.id.in_(ids)).delete(synchronize_session=False)
+        session.commit()
+
+
+def run_retention(
+    max_age_days: int = RETENTION_DAYS,
+    max_per_owner: int = RETENTION_MAX_PER_OWNER,
+    root: Optional[str] = None,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    bind: Optional[Engine] = None,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    root = root or ARCHIVE_DIR
+    bind = bind or default_engine
+    condition = _retention_condition(bind, max_age_days, max_per_owner)
+    summary = {"archived": 0, "deleted": 0, "segments": 0, "recovered": 0}
+    if condition is None:
+        return summary
+
+    with Session(bind=bind) as session:
+        if dry_run:
+            summary["archived"] = session.query(func.count(Analysis.id)).filter(condition).scalar() or 0
+            return summary
+
+        summary["recovered"] = _finish_interrupted_run(session, batch_size)
+
+        run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        writers: Dict[date, _SegmentWriter] = {}
+        archived_ids: List[int] = []
+        stmt = (
+            select(*Analysis.__table__.columns)
+            .where(condition)
+            .order_by(Analysis.created_at, Analysis.id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        try:
+            # A dedicated connection keeps the server-side cursor open while
+            # index rows commit on the session's own connection.
+            with bind.connect() as stream_conn:
+                for partition in stream_conn.execute(stmt).partitions():
+                    entries: List[Dict[str, Any]] = []
+                    for row in partition:
+                        record = _serialize(row)
+                        day = rollup_day(row.created_at)
+                        writer = writers.get(day)
+                        if writer is None:
+                            writer = writers[day] = _SegmentWriter(root, day, run_id)
+                        entries.extend(writer.add(record))
+                    for writer in writers.values():
+                        entries.extend(writer.flush())
+                        writer.sync()
+                    # Segments are durable before the index points at them.
+                    session.bulk_insert_mappings(ArchivedAnalysis, entries)
+                    session.commit()
+                    archived_ids.extend(entry["id"] for entry in entries)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        summary["archived"] = len(archived_ids)
+        summary["segments"] = len(writers)
+        for start in range(0, len(archived_ids), batch_size):
+            chunk = archived_ids[start : start + batch_size]
+            summary["deleted"] += session.query(Analysis).filter(Analysis.id.in_(chunk)).delete(
+                synchronize_session=False
+            )
+            session.commit()
+    return summary
+
+
+def read_archived_record(
+    segment: str,
+    byte_offset: int,
+    line_number: int,
+    root: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Decompress only the gzip member holding the record and return its JSON object."""
+    decompressor = zlib.decompressobj(wbits=31)
+    data = bytearray()
+    with open(os.path.join(root or ARCHIVE_DIR, segment), "rb") as handle:
+        handle.seek(byte_offset)
+        while not decompressor.eof:
+            chunk = handle.read(64 * 1024)
+            if not chunk:
+                break
+            data += decompressor.decompress(chunk)
+    return json.loads(bytes(data).split(b"\n")[line_number])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive and delete analyses past the retention policy.")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Archive rows older than N days (0 disables).")
+    parser.add_argument(
+        "--max-per-owner",
+        type=int,
+        default=RETENTION_MAX_PER_OWNER,
+        help="Keep only the newest N rows per owner (0 disables).",
+    )
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be archived.")
+    args = parser.parse_args()
+
+    summary = run_retention(args.days, args.max_per_owner, args.archive_dir, dry_run=args.dry_run)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
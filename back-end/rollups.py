@@ -0,0 +1,243 @@
+"""Per-owner daily score rollups, maintained in the same transaction as analysis inserts.
+
+Rebuild from existing analyses (run with writers stopped):
+
+    python rollups.py rebuild
+
+Owner-days that have rows in `archived_analyses` keep their rollup rows as
+they are; the archived rows are no longer in `analyses` to recount.
+"""
+
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, insert as core_insert
+from sqlalchemy.orm import Session
+
+from db import SessionLocal, dialect_insert
+from models import Analysis, AnalysisRollup, ArchivedAnalysis
+
+METRICS = ("score", "clarity", "emotion", "credibility", "market_effectiveness")
+_KEY_COLUMNS = ("owner_key", "day", "tone", "persona")
+_ADDITIVE_COLUMNS = ("count", "gemini_count", "fallback_count", *(f"{metric}_sum" for metric in METRICS))
+
+RollupKey = Tuple[str, date, str, str]
+
+
+def rollup_day(created_at: datetime) -> date:
+    """UTC calendar day of a timestamp; naive values are already UTC."""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def _accumulate(
+    totals: Dict[RollupKey, Dict[str, int]],
+    owner_id: Optional[str],
+    created_at: datetime,
+    tone: str,
+    persona: str,
+    source: Optional[str],
+    scores: Dict[str, int],
+) -> None:
+    key = (owner_id or "", rollup_day(created_at), tone, persona)
+    entry = totals.get(key)
+    if entry is None:
+        entry = {"count": 0, "gemini_count": 0, "fallback_count": 0}
+        for metric in METRICS:
+            entry[f"{metric}_sum"] = 0
+            entry[f"{metric}_min"] = scores[metric]
+            entry[f"{metric}_max"] = scores[metric]
+        totals[key] = entry
+
+    entry["count"] += 1
+    if source == "gemini":
+        entry["gemini_count"] += 1
+    elif source == "fallback":
+        entry["fallback_count"] += 1
+    for metric in METRICS:
+        value = scores[metric]
+        entry[f"{metric}_sum"] += value
+        entry[f"{metric}_min"] = min(entry[f"{metric}_min"], value)
+        entry[f"{metric}_max"] = max(entry[f"{metric}_max"], value)
+
+
+def _rollup_rows(totals: Dict[RollupKey, Dict[str, int]]) -> List[Dict[str, Any]]:
+    return [{**dict(zip(_KEY_COLUMNS, key)), **values} for key, values in totals.items()]
+
+
+def _merge_totals(db: Session, totals: Dict[RollupKey, Dict[str, int]]) -> None:
+    insert = dialect_insert(db)
+    if insert is not None:
+        table = AnalysisRollup.__table__
+        stmt = insert(table).values(_rollup_rows(totals))
+        excluded = stmt.excluded
+        updates: Dict[str, Any] = {}
+        for column in _ADDITIVE_COLUMNS:
+            updates[column] = table.c[column] + excluded[column]
+        for metric in METRICS:
+            low, high = f"{metric}_min", f"{metric}_max"
+            updates[low] = case((excluded[low] < table.c[low], excluded[low]), else_=table.c[low])
+            updates[high] = case((excluded[high] > table.c[high], excluded[high]), else_=table.c[high])
+        db.execute(stmt.on_conflict_do_update(index_elements=list(_KEY_COLUMNS), set_=updates))
+        return
+
+    for key, values in totals.items():
+        row = db.get(AnalysisRollup, key, with_for_update=True)
+        if row is None:
+            db.add(AnalysisRollup(**dict(zip(_KEY_COLUMNS, key)), **values))
+            continue
+        for column in _ADDITIVE_COLUMNS:
+            setattr(row, column, getattr(row, column) + values[column])
+        for metric in METRICS:
+            low, high = f"{metric}_min", f"{metric}_max"
+            setattr(row, low, min(getattr(row, low), values[low]))
+            setattr(row, high, max(getattr(row, high), values[high]))
+
+
+def apply_rollups(db: Session, analyses: Iterable[Analysis]) -> None:
+    """Fold freshly flushed analyses into their rollup rows without committing.
+
+    `created_at` is server-generated, so callers flush first; the caller's
+    commit then lands the analyses and their rollups atomically.
+    """
+    totals: Dict[RollupKey, Dict[str, int]] = {}
+    for analysis in analyses:
+        _accumulate(
+            totals,
+            analysis.owner_id,
+            analysis.created_at,
+            analysis.tone,
+            analysis.persona,
+            (analysis.analysis_meta or {}).get("source"),
+            {metric: getattr(analysis, metric) for metric in METRICS},
+        )
+    if totals:
+        _merge_totals(db, totals)
+
+
+def _archived_owner_days(db: Session, chunk_size: int) -> Set[Tuple[str, date]]:
+    query = db.query(ArchivedAnalysis.owner_id, ArchivedAnalysis.created_at).yield_per(chunk_size)
+    return {(owner_id or "", rollup_day(created_at)) for owner_id, created_at in query}
+
+
+def rebuild_rollups(db: Session, chunk_size: int = 1000) -> int:
+    """Recompute rollup rows from `analyses`; returns the number of rollup rows.
+
+    Rows for owner-days with archived analyses are preserved unchanged, since
+    they still count analyses that retention moved out of the table.
+    """
+    archived = _archived_owner_days(db, chunk_size)
+    totals: Dict[RollupKey, Dict[str, int]] = {}
+    query = db.query(
+        Analysis.owner_id,
+        Analysis.created_at,
+        Analysis.tone,
+        Analysis.persona,
+        Analysis.analysis_meta,
+        *(getattr(Analysis, metric) for metric in METRICS),
+    ).yield_per(chunk_size)
+    for row in query:
+        if (row.owner_id or "", rollup_day(row.created_at)) in archived:
+            continue
+        _accumulate(
+            totals,
+            row.owner_id,
+            row.created_at,
+            row.tone,
+            row.persona,
+            (row.analysis_meta or {}).get("source"),
+            {metric: getattr(row, metric) for metric in METRICS},
+        )
+
+    columns = [column.name for column in AnalysisRollup.__table__.columns]
+    preserved = [
+        {name: getattr(row, name) for name in columns}
+        for row in db.query(AnalysisRollup).yield_per(chunk_size)
+        if (row.owner_key, row.day) in archived
+    ]
+    db.query(AnalysisRollup).delete(synchronize_session=False)
+    rows = _rollup_rows(totals) + preserved
+    for start in range(0, len(rows), chunk_size):
+        db.execute(core_insert(AnalysisRollup), rows[start : start + chunk_size])
+    db.commit()
+    return len(rows)
+
+
+def query_rollups(
+    db: Session,
+    owner_id: Optional[str],
+    start: date,
+    end: date,
+    tone: Optional[str] = None,
+    persona: Optional[str] = None,
+) -> List[AnalysisRollup]:
+    query = db.query(AnalysisRollup).filter(AnalysisRollup.day >= start, AnalysisRollup.day <= end)
+    if owner_id:
+        query = query.filter(AnalysisRollup.owner_key == owner_id)
+    if tone:
+        query = query.filter(AnalysisRollup.tone == tone)
+    if persona:
+        query = query.filter(AnalysisRollup.persona == persona)
+    return query.all()
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def summarize_rollups(rows: Iterable[AnalysisRollup], granularity: str) -> List[Dict[str, Any]]:
+    """Merge rollup rows into per-period buckets with avg/min/max per metric."""
+    buckets: Dict[date, Dict[str, int]] = {}
+    for row in rows:
+        period = period_start(row.day, granularity)
+        bucket = buckets.get(period)
+        if bucket is None:
+            buckets[period] = {column.name: getattr(row, column.name) for column in AnalysisRollup.__table__.columns}
+            continue
+        for column in _ADDITIVE_COLUMNS:
+            bucket[column] += getattr(row, column)
+        for metric in METRICS:
+            bucket[f"{metric}_min"] = min(bucket[f"{metric}_min"], getattr(row, f"{metric}_min"))
+            bucket[f"{metric}_max"] = max(bucket[f"{metric}_max"], getattr(row, f"{metric}_max"))
+
+    return [
+        {
+            "period": period,
+            "count": bucket["count"],
+            "gemini_count": bucket["gemini_count"],
+            "fallback_count": bucket["fallback_count"],
+            "metrics": {
+                metric: {
+                    "avg": round(bucket[f"{metric}_sum"] / bucket["count"], 2),
+                    "min": bucket[f"{metric}_min"],
+                    "max": bucket[f"{metric}_max"],
+                }
+                for metric in METRICS
+            },
+        }
+        for period, bucket in sorted(buckets.items())
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain analysis score rollups.")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        db = SessionLocal()
+        try:
+            written = rebuild_rollups(db)
+        finally:
+            db.close()
+        print(f"Rebuilt {written} rollup rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compare stored sizes and decode latency of the analysis column codecs.
+
+Run from back-end/:
+
+    python tests/bench_compression.py [--rows N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from typing import Callable, List
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
+
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import compression
+from app import run_simple_analysis_with_meta
+
+MESSAGES = [
+    "We help B2B teams reduce onboarding time by 32% in 60 days. Book a demo this week.",
+    "Our platform is innovative and amazing. Let us know if you are interested.",
+    "Trusted by 120 finance teams, we cut month-end close from 9 days to 4. Reply to schedule a 20-minute call.",
+    "Hey there! Quick note: our tool saves support teams hours every week. Want a trial?",
+]
+TONES = ["professional", "casual", "enthusiastic"]
+PERSONAS = ["expert", "friendly", "authoritative"]
+
+
+def _sample_values(rows: int) -> List[str]:
+    rng = random.Random(1234)
+    values: List[str] = []
+    for _ in range(rows):
+        message = rng.choice(MESSAGES)
+        result, meta = run_simple_analysis_with_meta(message, rng.choice(TONES), rng.choice(PERSONAS))
+        meta.update(fallback_reason="", cache_hit=False, coalesced=False)
+        values.extend([message, result.suggestion, json.dumps(meta, ensure_ascii=False)])
+    return values
+
+
+def _zlib_plain(value: str) -> bytes:
+    return zlib.compress(value.encode("utf-8"), 6)
+
+
+def _run(name: str, encode: Callable[[str], bytes], decode: Callable[[bytes], str], values: List[str]) -> None:
+    encoded = [encode(value) for value in values]
+    started = time.perf_counter()
+    for blob in encoded:
+        decode(blob)
+    elapsed = time.perf_counter() - started
+    plain = sum(len(value.encode("utf-8")) for value in values)
+    stored = sum(len(blob) for blob in encoded)
+    print(
+        f"{name:<12} {stored / 1024:>9.1f} KiB  "
+        f"ratio {stored / plain:>5.2f}  "
+        f"decode {elapsed / len(values) * 1e6:>6.2f} us/value"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000)
+    args = parser.parse_args()
+
+    values = _sample_values(args.rows)
+    print(f"{args.rows:,} rows, {len(values):,} values")
+    _run("plain", lambda value: value.encode("utf-8"), lambda blob: blob.decode("utf-8"), values)
+    _run("zlib", _zlib_plain, lambda blob: zlib.decompress(blob).decode("utf-8"), values)
+    _run(
+        "zlib+dict",
+        lambda value: compression.encode_text(value, compression.CODEC_ZLIB_V1),
+        compression.decode_text,
+        values,
+    )
+    if compression.zstandard is not None:
+        _run(
+            "zstd+dict",
+            lambda value: compression.encode_text(value, compression.CODEC_ZSTD_V1),
+            compression.decode_text,
+            values,
+        )
+    else:
+        print("zstd+dict    skipped (zstandard not installed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Feed pathological model output through the previous and current JSON extractors.
+
+Run from back-end/:
+
+    python tests/bench_extract_json.py [--size N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
+
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from app import _extract_json
+
+
+def legacy_extract_json(text: str) -> dict:
+    """The previous fallback: rescan from every `{` until one parses."""
+    text = (text or "").strip()
+    if not text:
+        raise ValueError("Gemini returned empty output.")
+
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return parsed
+    except Exception:
+        pass
+
+    starts = [idx for idx, char in enumerate(text) if char == "{"]
+    for start in starts:
+        depth = 0
+        in_string = False
+        escaped = False
+        for idx in range(start, len(text)):
+            char = text[idx]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                continue
+            if char == '"':
+                in_string = True
+                continue
+            if char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    candidate = text[start : idx + 1]
+                    try:
+                        parsed = json.loads(candidate)
+                        if isinstance(parsed, dict):
+                            return parsed
+                    except Exception:
+                        break
+    raise ValueError("No valid JSON object found in Gemini output.")
+
+
+def _time(extract: Callable[[str], dict], text: str) -> str:
+    started = time.perf_counter()
+    try:
+        extract(text)
+        outcome = "ok"
+    except ValueError:
+        outcome = "error"
+    return f"{(time.perf_counter() - started) * 1000:>9.2f} ms ({outcome})"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=4_000)
+    args = parser.parse_args()
+
+    payload = json.dumps({"score": 80, "suggestion": "Cut onboarding to two days.", "insights": ["A", "B", "C"]})
+    cases = {
+        "clean": payload,
+        "fenced": f"```json\n{payload}\n```",
+        "unclosed braces": "{" * args.size,
+        "truncated": payload[:-2] + ', "notes": "' + "x" * args.size,
+        "brace prose": "Use {x} and { y " * (args.size // 16) + payload,
+        # One brace short of balanced; kept below json's recursion limit.
+        "deep nesting": '{"a":' * 400 + "1" + "}" * 399,
+        # Balanced, but every nested object fails at the trailing comma.
+        "nested invalid": ('{"a":"' + "x" * (args.size // 8) + '","b":') * 400 + "1,}" + "}" * 399,
+    }
+    for name, text in cases.items():
+        print(f"{name:<16} {len(text):>9,} chars  legacy {_time(legacy_extract_json, text)}  current {_time(_extract_json, text)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Micro-benchmarks for the analysis hot paths, with a saved baseline and a regression check.
+
+Run from back-end/ (offline; inputs are generated locally):
+
+    python tests/bench_hot_paths.py                      # print timings
+    python tests/bench_hot_paths.py --save-baseline      # record tests/bench_baseline.json
+    python tests/bench_hot_paths.py --check [--threshold 0.25]
+
+`--check` exits with status 1 when any benchmark is slower than its baseline by
+more than the threshold (a fraction: 0.25 = 25%). Baselines are machine
+specific, so record one on the box that runs the check.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
+
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from app import (
+    FETCH_TEXT_CHAR_LIMIT,
+    _VisibleTextExtractor,
+    _analysis_to_response,
+    _extract_json,
+    _incremental_decoder,
+    _normalize_analysis_output,
+    run_simple_analysis_with_meta,
+)
+from models import Analysis
+
+DEFAULT_BASELINE = os.path.join(CURRENT_DIR, "bench_baseline.json")
+
+SENTENCES = [
+    "We help B2B revenue teams cut onboarding time by 32% in 60 days.",
+    "Our data shows proven results across 120 finance teams.",
+    "Customers love how quickly they win back hours every week.",
+    "Book a demo this week to see the workflow on your own pipeline.",
+    "Research from our latest benchmark backs every claim with evidence.",
+    "The platform is powerful, simple, and built for growing teams.",
+]
+
+GEMINI_PAYLOAD = {
+    "score": 81,
+    "clarity": 84,
+    "emotion": 66,
+    "credibility": 88,
+    "market_effectiveness": 80,
+    "suggestion": "Cut onboarding time by 32% in 60 days. Trusted by 120 finance teams. Book a 20-minute demo.",
+    "insights": [
+        "Lead with the quantified outcome.",
+        "Name the audience in the first sentence.",
+        "Keep a single, specific call to action.",
+    ],
+    "confidence": 0.82,
+    "diagnostics": {
+        "target_audience": "B2B finance leaders",
+        "primary_intent": "Book a demo",
+        "core_claims": ["32% faster onboarding", "120 finance teams"],
+        "gaps": ["No baseline for the 32% figure"],
+        "risks": ["Claim may read as unverified without a source."],
+    },
+    "rewrite_options": [
+        "Outcome-first: 32% faster onboarding in 60 days.",
+        "Proof-first: 120 finance teams already onboard in half the time.",
+        "Question-led: What would 60 days back mean for your team?",
+    ],
+    "evidence_needs": [
+        "Baseline onboarding time before the change.",
+        "Named customer or case study.",
+        "Sample size behind the 32% figure.",
+    ],
+}
+
+
+def _message(length: int) -> str:
+    rng = random.Random(length)
+    parts: List[str] = []
+    while sum(len(part) + 1 for part in parts) < length:
+        parts.append(rng.choice(SENTENCES))
+    return " ".join(parts)[:length]
+
+
+def _html_page(size: int, script_share: float = 0.2) -> str:
+    """A realistic page: head with styles, nav, scripts, articles, and a table."""
+    rng = random.Random(size)
+    head = (
+        "<!doctype html><html><head><title>PitchLens benchmark</title>"
+        "<style>body{font-family:sans-serif}.nav a{margin:0 4px}</style>"
+        "<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments)}</script>"
+        "</head><body><nav class='nav'>" + "".join(f"<a href='/p{i}'>Link {i}</a>" for i in range(40)) + "</nav>"
+    )
+    blocks: List[str] = [head]
+    total = len(head)
+    while total < size:
+        kind = rng.random()
+        if kind < script_share:
+            block = "<script>(function(){var x=" + json.dumps(SENTENCES) + ";console.log(x.length)})();</script>"
+        elif kind < script_share + (1 - script_share) * 0.75:
+            block = "<article><h2>Section</h2>" + "".join(
+                f"<p>{rng.choice(SENTENCES)} <a href='#'>more</a> &amp; <b>details</b></p>" for _ in range(5)
+            ) + "</article>"
+        else:
+            block = "<table>" + "".join(
+                f"<tr><td>{i}</td><td>{rng.randrange(1000)}</td><td>{rng.choice(SENTENCES)[:30]}</td></tr>"
+                for i in range(10)
+            ) + "</table>"
+        blocks.append(block)
+        total += len(block)
+    blocks.append("<footer>&copy; PitchLens</footer></body></html>")
+    return "".join(blocks)
+
+
+def _analysis_rows(count: int) -> List[Analysis]:
+    result, meta = run_simple_analysis_with_meta(_message(300), "professional", "expert")
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        Analysis(
+            id=index + 1,
+            owner_id="owner-bench",
+            message=_message(300),
+            url=None,
+            tone="professional",
+            persona="expert",
+            score=result.score,
+            clarity=result.clarity,
+            emotion=result.emotion,
+            credibility=result.credibility,
+            market_effectiveness=result.market_effectiveness,
+            suggestion=result.suggestion,
+            insights=result.insights,
+            analysis_meta=meta,
+            created_at=created_at,
+        )
+        for index in range(count)
+    ]
+
+
+def _url_extract(chunks: List[bytes]) -> str:
+    """The bounded streaming loop from `_fetch_url_text`, fed from memory."""
+    extractor = _VisibleTextExtractor(FETCH_TEXT_CHAR_LIMIT)
+    decoder = _incremental_decoder("utf-8")
+    for chunk in chunks:
+        extractor.feed(decoder.decode(chunk))
+        if extractor.done:
+            break
+    else:
+        extractor.feed(decoder.decode(b"", final=True))
+    return extractor.close()
+
+
+def _chunked(page: str, size: int = 16 * 1024) -> List[bytes]:
+    data = page.encode("utf-8")
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+def _extract_or_none(text: str) -> object:
+    # Pathological inputs are expected to fail; the cost of failing is what is measured.
+    try:
+        return _extract_json(text)
+    except ValueError:
+        return None
+
+
+def build_benchmarks() -> Dict[str, Callable[[], object]]:
+    benchmarks: Dict[str, Callable[[], object]] = {}
+
+    for length in (40, 300, 2000):
+        message = _message(length)
+        benchmarks[f"scorer/{length}_chars"] = lambda message=message: run_simple_analysis_with_meta(
+            message, "professional", "expert"
+        )
+
+    normalize_message = _message(300)
+    benchmarks["normalize/gemini_payload"] = lambda: _normalize_analysis_output(
+        GEMINI_PAYLOAD, normalize_message, "professional", "expert", "gemini", ["Fallback insight."]
+    )
+
+    payload = json.dumps(GEMINI_PAYLOAD)
+    extract_inputs = {
+        "clean": payload,
+        "noisy": f"Here is the analysis you asked for:\n```json\n{payload}\n```\nLet me know if {{anything}} else helps.",
+        "unclosed_braces": "{" * 4000,
+        "brace_prose": "Use {x} and { y " * 250 + payload,
+    }
+    for name, text in extract_inputs.items():
+        benchmarks[f"extract_json/{name}"] = lambda text=text: _extract_or_none(text)
+
+    # Typical pages stop once enough visible text is collected; a page that is
+    # almost all script has to be read to the end.
+    for kilobytes in (100, 300, 600):
+        chunks = _chunked(_html_page(kilobytes * 1024))
+        benchmarks[f"url_extract/{kilobytes}kb"] = lambda chunks=chunks: _url_extract(chunks)
+    script_heavy = _chunked(_html_page(600 * 1024, script_share=1.0))
+    benchmarks["url_extract/600kb_script_heavy"] = lambda: _url_extract(script_heavy)
+
+    rows = _analysis_rows(100)
+    benchmarks["serialize/100_rows"] = lambda: [_analysis_to_response(row).model_dump(mode="json") for row in rows]
+    return benchmarks
+
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> float:
+    """Best per-call time in seconds over `repeat` runs of an auto-sized loop."""
+    fn()  # warm caches and lazy imports
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    gc.collect()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _format(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:>9.3f} ms"
+    return f"{seconds * 1e6:>9.2f} us"
+
+
+def _environment() -> Dict[str, str]:
+    return {"python": platform.python_version(), "machine": platform.machine(), "node": platform.node()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH")
+    parser.add_argument("--check", nargs="?", const=DEFAULT_BASELINE, metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction (default 0.25).")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timed loop.")
+    args = parser.parse_args()
+
+    baseline: Dict[str, float] = {}
+    if args.check:
+        with open(args.check, encoding="utf-8") as handle:
+            saved = json.load(handle)
+        baseline = saved["results"]
+        if saved.get("environment") != _environment():
+            print(f"warning: baseline was recorded on {saved.get('environment')}, running on {_environment()}")
+
+    results: Dict[str, float] = {}
+    regressions: List[Tuple[str, float]] = []
+    for name, fn in build_benchmarks().items():
+        if args.filter not in name:
+            continue
+        seconds = measure(fn, args.repeat, args.min_time)
+        results[name] = seconds
+        line = f"{name:<32} {_format(seconds)}"
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            line += f"   baseline {_format(baseline[name])}  {change:>+7.1%}"
+            if change > args.threshold:
+                regressions.append((name, change))
+                line += "  REGRESSION"
+        elif args.check:
+            line += "   (no baseline)"
+        print(line, flush=True)
+
+    if args.save_baseline:
+        # Merge, so saving a --filter subset keeps the other benchmarks' baselines.
+        merged: Dict[str, float] = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, encoding="utf-8") as handle:
+                saved = json.load(handle)
+            if saved.get("environment") == _environment():
+                merged = saved["results"]
+            else:
+                print(f"Replacing baseline recorded on {saved.get('environment')}")
+        merged.update(results)
+        with open(args.save_baseline, "w", encoding="utf-8") as handle:
+            json.dump({"environment": _environment(), "results": merged}, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Saved baseline for {len(results)} benchmarks to {args.save_baseline} ({len(merged)} in total)")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}:")
+        for name, change in regressions:
+            print(f"  {name}: {change:+.1%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Compare the in-memory GCRA limiter with the previous list-based fallback.
+
+Run from back-end/:
+
+    python tests/bench_rate_limiter.py [--requests N] [--keys N] [--limit N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
+
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from app import RATE_LIMIT_PERIOD, _MemoryRateLimiter
+
+
+class ListRateLimiter:
+    """The pre-GCRA fallback: a never-evicted list of timestamps per key."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.cache: Dict[str, List[int]] = {}
+
+    def consume(self, key: str, now: float) -> bool:
+        now_int = int(now)
+        window_start = now_int - 60
+        bucket = self.cache.get(key, [])
+        bucket = [timestamp for timestamp in bucket if timestamp >= window_start]
+        if len(bucket) + 1 > self.limit:
+            return False
+        bucket.append(now_int)
+        self.cache[key] = bucket
+        return True
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+
+def _run(name: str, consume: Callable[[str, float], bool], size: Callable[[], int], keys: List[str]) -> None:
+    tracemalloc.start()
+    now = time.time()
+    allowed = 0
+    started = time.perf_counter()
+    for index, key in enumerate(keys):
+        allowed += consume(key, now + index * 0.0001)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<8} {len(keys) / elapsed:>12,.0f} req/s  "
+        f"{elapsed / len(keys) * 1e6:>7.2f} us/req  "
+        f"peak {peak / 1024 / 1024:>7.2f} MiB  "
+        f"keys {size():>8,}  allowed {allowed:,}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500_000)
+    parser.add_argument("--keys", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=60)
+    parser.add_argument("--max-keys", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    # A few hot clients plus a long tail of one-off IPs.
+    hot = [f"user:hot-{index}" for index in range(50)]
+    keys = [
+        rng.choice(hot) if rng.random() < 0.5 else f"ip:10.{rng.randrange(args.keys)}"
+        for _ in range(args.requests)
+    ]
+
+    increment = RATE_LIMIT_PERIOD / args.limit
+    legacy = ListRateLimiter(args.limit)
+    gcra = _MemoryRateLimiter(args.max_keys)
+
+    print(f"{args.requests:,} requests over {len(set(keys)):,} keys, limit {args.limit}/min")
+    _run("list", legacy.consume, legacy.__len__, keys)
+    _run("gcra", lambda key, now: gcra.consume(key, now, increment), gcra.__len__, keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Time the deterministic scorer one message at a time and through score_many.
+
+Run from back-end/:
+
+    python tests/bench_scorer.py [--messages N] [--distinct N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
+
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from app import run_simple_analysis_with_meta, score_many
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with open(os.path.join(CURRENT_DIR, "golden", "deterministic_scores.json"), encoding="utf-8") as handle:
+        corpus = [case["message"] for case in json.load(handle)]
+    rng = random.Random(1234)
+    distinct = [f"{rng.choice(corpus)} Ref {index}." for index in range(args.distinct)]
+    messages = [rng.choice(distinct) for _ in range(args.messages)]
+
+    started = time.perf_counter()
+    for message in messages:
+        run_simple_analysis_with_meta(message, "professional", "expert")
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    score_many(messages, "professional", "expert")
+    batch = time.perf_counter() - started
+
+    print(f"{len(messages):,} messages, {len(set(messages)):,} distinct")
+    print(f"single     {single / len(messages) * 1e6:>8.2f} us/message")
+    print(f"score_many {batch / len(messages) * 1e6:>8.2f} us/message")
+
+
+if __name__ == "__main__":
+    main()
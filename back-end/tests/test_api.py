@@ -1,7 +1,31 @@
+import asyncio
+import copy
+import gzip
+import http.server
+import ipaddress
+import json
+import logging
 import os
+import socket
+import subprocess
 import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
 
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from jose import jwk, jwt
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
 
 CURRENT_DIR = os.path.dirname(__file__)
 BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
@@ -9,8 +33,14 @@ BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
 if BACKEND_ROOT not in sys.path:
     sys.path.insert(0, BACKEND_ROOT)
 
-from app import app
-from db import init_db
+import app as app_module
+import compression
+import db as db_module
+import retention
+from app import AnalyzeResponse, app
+from db import DATABASE_URL, Base, SessionLocal, async_database_url, async_engine, engine, get_session, init_db
+from models import Analysis, AnalysisRollup, ArchivedAnalysis, RateLimitState
+from rollups import apply_rollups, rebuild_rollups
 
 
 def test_analyze_and_latest_endpoints_work():
@@ -36,3 +66,1127 @@ def test_analyze_and_latest_endpoints_work():
         latest = client.get("/analyses/latest")
         assert latest.status_code == 200
         assert latest.json().get("id") == payload["id"]
+
+
+def test_repeated_analysis_is_served_from_cache(monkeypatch):
+    init_db()
+    calls = []
+
+    async def fake_gemini(message, tone, persona):
+        calls.append(message)
+        result = AnalyzeResponse(
+            score=77,
+            clarity=70,
+            emotion=60,
+            credibility=80,
+            market_effectiveness=77,
+            suggestion="A sharper version of the pitch.",
+            insights=["One", "Two", "Three"],
+        )
+        return result, {"source": "gemini", "model": app_module.GENAI_MODEL}
+
+    monkeypatch.setattr(app_module, "run_gemini_analysis", fake_gemini)
+    message = f"Cached pitch {uuid.uuid4()} with 30% faster onboarding."
+
+    with TestClient(app) as client:
+        first = client.post("/analyze", json={"message": message})
+        second = client.post("/analyze", json={"message": f"  {message} "})
+        app_module._analysis_cache.clear()
+        third = client.post("/analyze", json={"message": message})
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert len(calls) == 1
+    assert first.json()["analysis_meta"]["cache_hit"] is False
+    assert second.json()["analysis_meta"]["cache_hit"] is True
+    assert second.json()["score"] == 77
+    assert second.json()["id"] != first.json()["id"]
+    assert third.json()["analysis_meta"]["cache_hit"] is True
+
+
+def test_async_gemini_mode_uses_rest_client(monkeypatch):
+    requests_seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_seen.append(request)
+        body = json.dumps(
+            {
+                "score": 81,
+                "clarity": 80,
+                "emotion": 70,
+                "credibility": 85,
+                "market_effectiveness": 82,
+                "suggestion": "Cut onboarding time by 30% in two weeks. Book a demo today.",
+                "insights": ["Lead with the metric.", "Name the audience.", "Keep the CTA."],
+            }
+        )
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": body}]}}]})
+
+    async def run():
+        app_module._http_clients["gemini"] = httpx.AsyncClient(
+            base_url=app_module.GEMINI_API_BASE_URL,
+            transport=httpx.MockTransport(handler),
+        )
+        try:
+            return await app_module.run_gemini_analysis(
+                "Our tool cuts onboarding time by 30%.", "professional", "expert"
+            )
+        finally:
+            await app_module._close_http_clients()
+            app_module._gemini_limiter = None
+
+    monkeypatch.setattr(app_module, "GEMINI_CLIENT_MODE", "async")
+    monkeypatch.setattr(app_module, "GOOGLE_API_KEY", "test-key")
+    result, meta = asyncio.run(run())
+
+    assert result.score == 81
+    assert meta["source"] == "gemini"
+    assert len(requests_seen) == 1
+    assert requests_seen[0].headers["x-goog-api-key"] == "test-key"
+    assert requests_seen[0].url.path.endswith(":generateContent")
+    generation_config = json.loads(requests_seen[0].content)["generationConfig"]
+    assert generation_config["responseMimeType"] == "application/json"
+    assert generation_config["responseSchema"] == app_module.GEMINI_RESPONSE_SCHEMA
+
+
+def test_concurrent_url_fetches_are_coalesced(monkeypatch):
+    calls = []
+
+    async def fake_fetch(url):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return f"Extracted landing page text for {url}"
+
+    monkeypatch.setattr(app_module, "_fetch_url_text", fake_fetch)
+    before = app_module._url_fetch_flight.stats()["coalesced"]
+
+    async def run():
+        return await asyncio.gather(
+            *(app_module.fetch_text_from_url("https://example.com/pitch") for _ in range(3))
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert len(set(results)) == 1
+    assert app_module._url_fetch_flight.stats()["coalesced"] - before == 2
+    assert app_module._url_fetch_flight.stats()["in_flight"] == 0
+
+
+def test_batch_analyze_returns_records_and_item_errors():
+    init_db()
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/analyze/batch",
+            json={
+                "items": [
+                    {"message": "Our data shows a 20% conversion increase this quarter."},
+                    {"message": "Too short"},
+                    {"message": "We love helping teams ship faster. Book a demo today!", "tone": "casual"},
+                ]
+            },
+        )
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["succeeded"] == 2
+    assert payload["failed"] == 1
+    assert [item["index"] for item in payload["items"]] == [0, 1, 2]
+    assert payload["items"][1]["status_code"] == 400
+    assert payload["items"][1]["record"] is None
+    first, third = payload["items"][0]["record"], payload["items"][2]["record"]
+    assert first["id"] != third["id"]
+    assert first["created_at"] and third["created_at"]
+    assert third["tone"] == "casual"
+
+
+def test_stream_emits_fallback_then_partials_then_record(monkeypatch):
+    init_db()
+    payload = json.dumps(
+        {
+            "score": 88,
+            "clarity": 84,
+            "emotion": 71,
+            "credibility": 90,
+            "market_effectiveness": 86,
+            "suggestion": "Cut onboarding to two days. Book a demo.",
+            "insights": ["Lead with the metric.", "Name the buyer.", "Keep one CTA."],
+        }
+    )
+
+    async def fake_stream(message, tone, persona):
+        for start in range(0, len(payload), 40):
+            yield payload[start : start + 40]
+
+    monkeypatch.setattr(app_module, "_gemini_stream_text", fake_stream)
+    message = f"Streamed pitch {uuid.uuid4()}: onboarding in 2 days with proven results."
+
+    with TestClient(app) as client:
+        response = client.post("/analyze/stream", json={"message": message})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+
+    assert events[0][0] == "fallback"
+    assert events[0][1]["analysis_meta"]["source"] == "fallback"
+    partial = {}
+    for name, data in events[1:-1]:
+        assert name == "partial"
+        partial.update(data)
+    assert partial["score"] == 88
+    assert partial["insights"] == ["Lead with the metric.", "Name the buyer.", "Keep one CTA."]
+    assert events[-1][0] == "result"
+    assert events[-1][1]["score"] == 88
+    assert events[-1][1]["analysis_meta"]["source"] == "gemini"
+    assert isinstance(events[-1][1]["id"], int)
+
+
+def test_url_fetch_uses_shared_client_and_checks_every_hop(monkeypatch):
+    checked_hosts = []
+
+    async def fake_resolve(hostname):
+        checked_hosts.append(hostname)
+        return [ipaddress.ip_address("93.184.216.34")]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "short.example":
+            return httpx.Response(301, headers={"Location": "https://www.example.com/landing"})
+        html = "<html><script>var x = 1;</script><body><h1>Launch faster</h1>" + "<p>Proven results.</p>" * 10
+        return httpx.Response(200, headers={"Content-Type": "text/html"}, text=html + "</body></html>")
+
+    async def run():
+        app_module._http_clients["fetch"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await app_module.fetch_text_from_url("https://short.example/p")
+        finally:
+            await app_module._close_http_clients()
+
+    monkeypatch.setattr(app_module, "_resolve_host_ips", fake_resolve)
+    monkeypatch.setattr(app_module, "_url_content_cache", app_module._UrlContentCache(0, 0, ""))
+    text = asyncio.run(run())
+
+    assert text.startswith("Launch faster Proven results.")
+    assert "var x" not in text
+    assert checked_hosts == ["short.example", "www.example.com"]
+
+
+def test_url_cache_serves_fresh_text_and_revalidates_stale_entries(monkeypatch, tmp_path):
+    seen = []
+    page = "<html><body>" + "<p>Teams cut onboarding time in half with our guided setup.</p>" * 3 + "</body></html>"
+
+    async def fake_resolve(hostname):
+        return [ipaddress.ip_address("93.184.216.34")]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.url.path, request.headers.get("If-None-Match")))
+        if request.url.path == "/go":
+            return httpx.Response(302, headers={"Location": "/landing"})
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"Content-Type": "text/html", "ETag": '"v1"'}, text=page)
+
+    async def fetch():
+        app_module._http_clients["fetch"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await app_module.fetch_text_from_url("https://www.example.com/go")
+        finally:
+            await app_module._close_http_clients()
+
+    cache = app_module._UrlContentCache(900, 1_000_000, str(tmp_path))
+    monkeypatch.setattr(app_module, "_resolve_host_ips", fake_resolve)
+    monkeypatch.setattr(app_module, "_url_content_cache", cache)
+
+    first = asyncio.run(fetch())
+    assert seen == [("/go", None), ("/landing", None)]
+
+    assert asyncio.run(fetch()) == first
+    assert len(seen) == 2
+
+    cache._entries["https://www.example.com/landing"]["fetched_at"] -= 3600
+    assert asyncio.run(fetch()) == first
+    assert seen[2:] == [("/go", None), ("/landing", '"v1"')]
+
+    restarted = app_module._UrlContentCache(900, 1_000_000, str(tmp_path))
+    monkeypatch.setattr(app_module, "_url_content_cache", restarted)
+    assert asyncio.run(fetch()) == first
+    assert len(seen) == 4
+
+    # The disk tier is swept by age, then oldest-first down to the size cap.
+    assert sorted(os.listdir(tmp_path)) and restarted.sweep_disk() == 0
+    old_path = tmp_path / "old.json"
+    old_path.write_text("{}")
+    os.utime(old_path, (0, 0))
+    aged = app_module._UrlContentCache(900, 1_000_000, str(tmp_path), disk_max_age=3600)
+    assert aged.sweep_disk() == 1 and not old_path.exists()
+    capped = app_module._UrlContentCache(900, 1_000_000, str(tmp_path), disk_max_bytes=1)
+    assert capped.sweep_disk() == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_url_fetch_connects_with_the_dns_cache_disabled(monkeypatch):
+    page = "<html><body><p>" + "We cut onboarding time by 32% in 60 days. " * 5 + "</p></body></html>"
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = page.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    async def fake_getaddrinfo(self, host, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 0))]
+
+    # DNS_CACHE_MAX_ENTRIES=0: nothing is cached between validation and connect.
+    monkeypatch.setattr(app_module, "_dns_cache", app_module._TTLCache(0, 60))
+    monkeypatch.setattr(app_module, "_url_content_cache", app_module._UrlContentCache(0, 0, ""))
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", fake_getaddrinfo)
+    monkeypatch.setattr(app_module, "_is_disallowed_ip", lambda address: False)
+    monkeypatch.setattr(app_module, "ALLOWED_WEB_PORTS", {80, 443, port})
+
+    async def fetch():
+        try:
+            return await app_module.fetch_text_from_url(f"http://pinned.example:{port}/")
+        finally:
+            await app_module._close_http_clients()
+
+    try:
+        text = asyncio.run(fetch())
+    finally:
+        server.shutdown()
+    assert text.startswith("We cut onboarding time by 32% in 60 days.")
+    assert app_module._pinned_addresses.get() == {}
+
+
+def test_url_fetch_stops_downloading_once_enough_text_is_collected(monkeypatch):
+    served = []
+
+    async def fake_resolve(hostname):
+        return [ipaddress.ip_address("93.184.216.34")]
+
+    async def body():
+        yield b"<html><head><script>" + b"var filler = 1;" * 2000 + b"</script></head><body>"
+        for index in range(200):
+            served.append(index)
+            yield f"<p>Section {index}: our platform reduces churn with proven playbooks.</p>".encode()
+        yield b"</body></html>"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Content-Type": "text/html; charset=utf-8"}, content=body())
+
+    async def run():
+        app_module._http_clients["fetch"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await app_module.fetch_text_from_url("https://www.example.com/long")
+        finally:
+            await app_module._close_http_clients()
+
+    monkeypatch.setattr(app_module, "_resolve_host_ips", fake_resolve)
+    monkeypatch.setattr(app_module, "_url_content_cache", app_module._UrlContentCache(0, 0, ""))
+    text = asyncio.run(run())
+
+    assert text.startswith("Section 0: our platform")
+    assert "filler" not in text
+    assert len(text) == app_module.FETCH_TEXT_CHAR_LIMIT
+    assert len(served) < 200
+
+
+def test_gcra_rate_limit_allows_burst_then_rejects(monkeypatch):
+    init_db()
+    monkeypatch.setattr(app_module, "RATE_LIMIT_PER_MINUTE", 3)
+    key = f"test-{uuid.uuid4()}"
+    batch_key = f"test-{uuid.uuid4()}"
+
+    db = SessionLocal()
+    try:
+        for _ in range(3):
+            asyncio.run(app_module._enforce_rate_limit(db, key))
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(app_module._enforce_rate_limit(db, key))
+        assert exc.value.status_code == 429
+
+        asyncio.run(app_module._enforce_rate_limit(db, batch_key, cost=2))
+        with pytest.raises(HTTPException):
+            asyncio.run(app_module._enforce_rate_limit(db, batch_key, cost=2))
+        asyncio.run(app_module._enforce_rate_limit(db, batch_key, cost=1))
+
+        db.add(RateLimitState(key=f"test-{uuid.uuid4()}", tat=time.time() - 10))
+        db.commit()
+        app_module._prune_expired_rows()
+        assert db.query(RateLimitState).filter(RateLimitState.tat < time.time()).count() == 0
+        assert db.get(RateLimitState, key) is not None
+    finally:
+        db.close()
+
+
+def test_shutdown_waits_for_cancelled_background_tasks(monkeypatch):
+    events = []
+
+    async def slow_pruning():
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.05)
+            events.append("pruning stopped")
+            raise
+
+    close_real_clients = app_module._close_http_clients
+
+    async def close_http_clients():
+        events.append("clients closed")
+        await close_real_clients()
+
+    monkeypatch.setattr(app_module, "DB_PRUNE_INTERVAL", 1)
+    monkeypatch.setattr(app_module, "_run_periodic_pruning", slow_pruning)
+    monkeypatch.setattr(app_module, "_close_http_clients", close_http_clients)
+    with TestClient(app):
+        pass
+    assert events == ["pruning stopped", "clients closed"]
+
+
+def test_async_session_path_serves_endpoints(monkeypatch):
+    init_db()
+    monkeypatch.setattr(app_module, "RATE_LIMIT_PER_MINUTE", 1000)
+    session_engine = create_async_engine(async_database_url(DATABASE_URL))
+    factory = async_sessionmaker(bind=session_engine, autoflush=False, expire_on_commit=False)
+    seen_sessions = []
+
+    async def override_session():
+        async with factory() as session:
+            seen_sessions.append(session)
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    try:
+        with TestClient(app) as client:
+            created = client.post(
+                "/analyze",
+                json={"message": f"Async session pitch {uuid.uuid4()}", "tone": "professional", "persona": "expert"},
+            )
+            assert created.status_code == 200
+            record_id = created.json()["id"]
+
+            batch = client.post(
+                "/analyze/batch",
+                json={"items": [{"message": f"Async batch {index} {uuid.uuid4()}"} for index in range(3)]},
+            )
+            assert batch.status_code == 200
+            assert batch.json()["succeeded"] == 3
+
+            assert client.get(f"/analyses/{record_id}").json()["id"] == record_id
+            assert client.get("/analyses/latest").status_code == 200
+            assert len(client.get("/analyses", params={"limit": 2}).json()) == 2
+    finally:
+        app.dependency_overrides.pop(get_session, None)
+        asyncio.run(session_engine.dispose())
+
+    assert seen_sessions and all(isinstance(session, app_module.AsyncSession) for session in seen_sessions)
+    assert async_database_url("sqlite:///./x.db").drivername == "sqlite+aiosqlite"
+    assert async_database_url("postgresql://u@h/db").drivername == "postgresql+psycopg"
+
+
+def test_db_pool_reports_checkout_waits_and_sqlite_pragmas(tmp_path):
+    init_db()
+    with db_module.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == db_module.SQLITE_BUSY_TIMEOUT_MS
+
+    pooled = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=db_module.TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    held = pooled.connect()
+    with pytest.raises(PoolTimeoutError):
+        pooled.connect()
+    held.close()
+    stats = pooled.pool.stats()
+    assert stats["checkouts"] == 1
+    assert stats["checkout_timeouts"] == 1
+    assert stats["checked_out"] == 0
+    pooled.dispose()
+
+    with TestClient(app) as client:
+        stats = client.get("/stats").json()
+    pools = stats["db_pools"]
+    assert set(stats["http_pools"]) == {"fetch", "jwks", "gemini"}
+    assert all(
+        set(client_stats) == {"open", "requests", "connections", "idle", "in_use", "http2"}
+        for client_stats in stats["http_pools"].values()
+    )
+    assert pools["sync"]["size"] == db_module.DB_POOL_SIZE
+    assert pools["sync"]["checkouts"] >= 1
+
+
+def test_http_pool_stats_report_idle_and_in_use_connections():
+    release = threading.Event()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/slow":
+                release.wait(5)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    async def run():
+        app_module._http_clients["jwks"] = app_module._build_http_client("jwks")
+        try:
+            http_client = app_module._http_clients["jwks"]
+            await http_client.get(f"{base}/")
+            idle = app_module._http_pool_stats()["jwks"]
+            slow = asyncio.ensure_future(http_client.get(f"{base}/slow"))
+            fast = await http_client.get(f"{base}/")
+            busy = app_module._http_pool_stats()["jwks"]
+            release.set()
+            await slow
+            return idle, fast, busy
+        finally:
+            await app_module._close_http_clients()
+
+    try:
+        idle, fast, busy = asyncio.run(run())
+    finally:
+        release.set()
+        server.shutdown()
+
+    assert fast.text == "ok"
+    assert {key: idle[key] for key in ("open", "connections", "idle", "in_use")} == {
+        "open": True, "connections": 1, "idle": 1, "in_use": 0,
+    }
+    # The keep-alive connection went to /slow, so the next request opened a second one.
+    assert (busy["connections"], busy["idle"], busy["in_use"]) == (2, 1, 1)
+    assert busy["requests"] - idle["requests"] == 2
+
+
+def test_analyses_keyset_pagination_walks_full_history(monkeypatch):
+    init_db()
+    owner = f"owner-{uuid.uuid4()}"
+    db = SessionLocal()
+    try:
+        # Rows inserted together share a second-precision timestamp, so paging
+        # must break ties on id rather than skip or repeat rows.
+        db.add_all(
+            Analysis(
+                owner_id=owner,
+                message=f"Pitch {index}",
+                tone="professional",
+                persona="expert",
+                score=50,
+                clarity=50,
+                emotion=50,
+                credibility=50,
+                market_effectiveness=50,
+                suggestion="Keep going.",
+                insights=["One", "Two", "Three"],
+            )
+            for index in range(7)
+        )
+        db.commit()
+        expected = [row.id for row in db.query(Analysis).filter(Analysis.owner_id == owner).order_by(
+            Analysis.created_at.desc(), Analysis.id.desc()
+        )]
+    finally:
+        db.close()
+
+    app.dependency_overrides[app_module.get_current_user_id] = lambda: owner
+    try:
+        with TestClient(app) as client:
+            seen = []
+            cursor = None
+            while True:
+                params = {"limit": 3}
+                if cursor:
+                    params["before"] = cursor
+                page = client.get("/analyses", params=params)
+                assert page.status_code == 200
+                seen.extend(item["id"] for item in page.json())
+                cursor = page.headers.get("x-next-cursor")
+                if not cursor:
+                    break
+            assert seen == expected
+
+            assert client.get("/analyses", params={"before": "not-a-cursor"}).status_code == 400
+
+            # Another owner's row cannot anchor the seek: the cursor's own
+            # (long past) timestamp is used, so nothing precedes it.
+            db = SessionLocal()
+            try:
+                foreign = Analysis(
+                    owner_id=f"other-{uuid.uuid4()}",
+                    message="Someone else's pitch",
+                    tone="professional",
+                    persona="expert",
+                    score=50,
+                    clarity=50,
+                    emotion=50,
+                    credibility=50,
+                    market_effectiveness=50,
+                    suggestion="Keep going.",
+                    insights=["One", "Two", "Three"],
+                )
+                db.add(foreign)
+                db.commit()
+                foreign.created_at = datetime(1900, 1, 1)
+                probe = app_module._encode_cursor(foreign)
+            finally:
+                db.close()
+            assert client.get("/analyses", params={"before": probe}).json() == []
+    finally:
+        app.dependency_overrides.pop(app_module.get_current_user_id, None)
+
+    db = SessionLocal()
+    try:
+        statement = app_module._recent_analyses_query(
+            db, owner, 4, (datetime(2100, 1, 1), expected[0])
+        ).statement.compile(engine)
+    finally:
+        db.close()
+    with engine.connect() as conn:
+        parameters = tuple(statement.params[name] for name in statement.positiontup)
+        plan = " ".join(
+            str(row[-1]) for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        )
+    assert "ix_analyses_owner_created_at_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_analyses_summary_view_projects_score_columns():
+    init_db()
+    active_engine = async_engine.sync_engine if async_engine is not None else engine
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM analyses" in statement:
+            statements.append(statement)
+
+    with TestClient(app) as client:
+        client.post("/analyze", json={"message": "A summary view pitch with 30% lift.", "tone": "professional"})
+        event.listen(active_engine, "before_cursor_execute", capture)
+        try:
+            summary = client.get("/analyses", params={"view": "summary", "limit": 1})
+        finally:
+            event.remove(active_engine, "before_cursor_execute", capture)
+        assert summary.status_code == 200
+        (item,) = summary.json()
+        assert set(item) == {
+            "id", "created_at", "tone", "persona", "score",
+            "clarity", "emotion", "credibility", "market_effectiveness",
+        }
+        assert summary.headers.get("x-next-cursor")
+
+        full = client.get(f"/analyses/{item['id']}")
+        assert full.json()["suggestion"]
+        assert client.get("/analyses", params={"view": "compact"}).status_code == 422
+
+    assert statements
+    assert all("analyses.message" not in statement and "analysis_meta" not in statement for statement in statements)
+
+
+def test_analysis_stats_are_served_from_rollups():
+    init_db()
+    owner = f"owner-{uuid.uuid4()}"
+    app.dependency_overrides[app_module.get_current_user_id] = lambda: owner
+    statements = []
+    active_engine = async_engine.sync_engine if async_engine is not None else engine
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    try:
+        with TestClient(app) as client:
+            scores = []
+            for message in ("We cut onboarding time by 40%.", "Buy now!!!", "Trusted by 3,000 teams."):
+                created = client.post("/analyze", json={"message": message, "tone": "professional"})
+                scores.append(created.json()["score"])
+            batch = client.post("/analyze/batch", json={"items": [{"message": "Batch pitch", "tone": "casual"}]})
+            assert batch.json()["succeeded"] == 1
+
+            event.listen(active_engine, "before_cursor_execute", capture)
+            try:
+                stats = client.get("/analyses/stats", params={"granularity": "month"})
+            finally:
+                event.remove(active_engine, "before_cursor_execute", capture)
+            assert stats.status_code == 200
+            (bucket,) = stats.json()["buckets"]
+            assert bucket["count"] == 4
+            assert bucket["gemini_count"] + bucket["fallback_count"] == 4
+
+            professional = client.get("/analyses/stats", params={"tone": "professional"}).json()["buckets"]
+            assert sum(item["count"] for item in professional) == 3
+            score = professional[0]["metrics"]["score"]
+            assert (score["min"], score["max"]) == (min(scores), max(scores))
+            assert score["avg"] == round(sum(scores) / 3, 2)
+
+            assert client.get("/analyses/stats", params={"from": "2026-02-01", "to": "2026-01-01"}).status_code == 400
+    finally:
+        app.dependency_overrides.pop(app_module.get_current_user_id, None)
+
+    assert statements and all("FROM analyses " not in statement for statement in statements)
+
+    db = SessionLocal()
+    try:
+        before = {
+            (row.day, row.tone, row.persona): (row.count, row.score_sum, row.score_min, row.score_max)
+            for row in db.query(AnalysisRollup).filter(AnalysisRollup.owner_key == owner)
+        }
+        rebuild_rollups(db)
+        after = {
+            (row.day, row.tone, row.persona): (row.count, row.score_sum, row.score_min, row.score_max)
+            for row in db.query(AnalysisRollup).filter(AnalysisRollup.owner_key == owner)
+        }
+    finally:
+        db.close()
+    assert before == after
+
+
+def _insert_analyses(session, owner, created_at_values):
+    rows = [
+        Analysis(
+            owner_id=owner,
+            message=f"Archived pitch {index}",
+            tone="professional",
+            persona="expert",
+            score=40 + index,
+            clarity=50,
+            emotion=50,
+            credibility=50,
+            market_effectiveness=50,
+            suggestion="Keep going.",
+            insights=["One", "Two", "Three"],
+            analysis_meta={"source": "fallback", "detail": "x" * 200},
+            created_at=created_at,
+        )
+        for index, created_at in enumerate(created_at_values)
+    ]
+    session.add_all(rows)
+    session.commit()
+    return [row.id for row in rows]
+
+
+def test_retention_archives_to_segments_and_serves_archived_ids(monkeypatch, tmp_path):
+    # Per-owner limits on an isolated database.
+    isolated = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    db_module._configure_engine(isolated)
+    Base.metadata.create_all(bind=isolated)
+    now = datetime.utcnow()
+    with Session(bind=isolated) as session:
+        kept_a = _insert_analyses(session, "a", [now - timedelta(days=3), now - timedelta(days=2), now])
+        _insert_analyses(session, "b", [now])
+
+    summary = retention.run_retention(
+        max_age_days=0, max_per_owner=1, root=str(tmp_path / "isolated"), batch_size=1, bind=isolated
+    )
+    assert summary["archived"] == 2 and summary["deleted"] == 2 and summary["segments"] == 2
+    with Session(bind=isolated) as session:
+        assert [row.id for row in session.query(Analysis).filter(Analysis.owner_id == "a")] == [kept_a[2]]
+    segments = sorted((tmp_path / "isolated").rglob("*.jsonl.gz"))
+    assert len(segments) == 2
+    assert [json.loads(line)["id"] for line in gzip.open(segments[0], "rt")] == [kept_a[0]]
+    isolated.dispose()
+
+    # Age-based archival on the app database, then the read-through fallback.
+    init_db()
+    owner = f"owner-{uuid.uuid4()}"
+    ancient = datetime(2001, 1, 1, 12, 0, 0)
+    session = SessionLocal()
+    try:
+        archived_ids = _insert_analyses(session, owner, [ancient + timedelta(minutes=i) for i in range(130)])
+    finally:
+        session.close()
+
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    assert retention.run_retention(max_age_days=365 * 20, dry_run=True)["archived"] >= 130
+    summary = retention.run_retention(max_age_days=365 * 20)
+    assert summary["archived"] >= 130
+
+    session = SessionLocal()
+    try:
+        assert session.query(Analysis).filter(Analysis.owner_id == owner).count() == 0
+        entry = session.get(ArchivedAnalysis, archived_ids[-1])
+        assert entry.line_number == 1 and entry.byte_offset > 0
+    finally:
+        session.close()
+
+    app.dependency_overrides[app_module.get_current_user_id] = lambda: owner
+    try:
+        with TestClient(app) as client:
+            record = client.get(f"/analyses/{archived_ids[-1]}")
+            assert record.status_code == 200
+            assert record.json()["message"] == "Archived pitch 129"
+            assert record.json()["analysis_meta"]["source"] == "fallback"
+    finally:
+        app.dependency_overrides.pop(app_module.get_current_user_id, None)
+
+    app.dependency_overrides[app_module.get_current_user_id] = lambda: "someone-else"
+    try:
+        with TestClient(app) as client:
+            assert client.get(f"/analyses/{archived_ids[-1]}").status_code == 404
+    finally:
+        app.dependency_overrides.pop(app_module.get_current_user_id, None)
+
+
+def test_rollup_rebuild_keeps_history_of_archived_days(tmp_path):
+    isolated = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    db_module._configure_engine(isolated)
+    Base.metadata.create_all(bind=isolated)
+    now = datetime.utcnow()
+    with Session(bind=isolated) as session:
+        _insert_analyses(session, "a", [now - timedelta(days=400), now - timedelta(days=400), now])
+        apply_rollups(session, session.query(Analysis).all())
+        session.commit()
+
+    def rollups():
+        with Session(bind=isolated) as session:
+            return {(row.day, row.count, row.score_sum) for row in session.query(AnalysisRollup)}
+
+    before = rollups()
+    assert len(before) == 2
+    summary = retention.run_retention(max_age_days=365, root=str(tmp_path / "archive"), bind=isolated)
+    assert summary["deleted"] == 2
+
+    with Session(bind=isolated) as session:
+        assert rebuild_rollups(session) == 2
+    assert rollups() == before
+    isolated.dispose()
+
+
+def test_analysis_text_columns_are_stored_compressed(monkeypatch):
+    meta = {"source": "fallback", "model": "deterministic-v2", "note": "ü" * 40}
+    monkeypatch.setattr(compression, "DB_COMPRESSION", "zlib")
+    init_db()
+    suggestion = "Backed by measurable outcomes and clear proof points. " * 4
+    session = SessionLocal()
+    try:
+        row = Analysis(
+            owner_id=f"owner-{uuid.uuid4()}",
+            message="Our platform cuts onboarding time by 32% in 60 days.",
+            tone="professional",
+            persona="expert",
+            score=70,
+            clarity=70,
+            emotion=70,
+            credibility=70,
+            market_effectiveness=70,
+            suggestion=suggestion,
+            insights=["One"],
+            analysis_meta=meta,
+        )
+        session.add(row)
+        session.commit()
+
+        stored = session.execute(
+            text("SELECT suggestion, analysis_meta FROM analyses WHERE id = :id"), {"id": row.id}
+        ).one()
+        assert stored.suggestion[:2] == bytes((compression.MAGIC, compression.CODEC_ZLIB_V1))
+        assert len(stored.suggestion) < len(suggestion)
+        assert compression.is_encoded(stored.analysis_meta)
+
+        session.expire_all()
+        reloaded = session.get(Analysis, row.id)
+        assert reloaded.suggestion == suggestion
+        assert reloaded.analysis_meta == meta
+    finally:
+        session.close()
+
+
+def test_init_db_refuses_columns_not_converted_by_migration_0008(monkeypatch):
+    legacy_engine = create_engine("sqlite://")
+    with legacy_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE analyses (id INTEGER PRIMARY KEY, message TEXT, suggestion TEXT, analysis_meta JSON)"))
+    monkeypatch.setattr(db_module, "engine", legacy_engine)
+    db_module._ensure_compressed_columns()  # SQLite keeps its declared types.
+
+    # Only non-SQLite dialects need the column types changed.
+    monkeypatch.setattr(legacy_engine.dialect, "name", "postgresql")
+    with pytest.raises(RuntimeError, match="20261017_0008") as excinfo:
+        db_module._ensure_compressed_columns()
+    assert "analyses.message, analyses.suggestion, analyses.analysis_meta" in str(excinfo.value)
+
+    with legacy_engine.begin() as conn:
+        conn.execute(text("DROP TABLE analyses"))
+        conn.execute(text("CREATE TABLE analyses (id INTEGER PRIMARY KEY, message BLOB, suggestion BLOB, analysis_meta BLOB)"))
+    db_module._ensure_compressed_columns()
+
+
+def test_verified_tokens_and_parsed_keys_are_cached(monkeypatch):
+    private_pem = (
+        rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        .private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+        .decode()
+    )
+    public_jwk = {**jwk.construct(private_pem, "RS256").public_key().to_dict(), "kid": "k1", "use": "sig"}
+    jwks_fetches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        jwks_fetches.append(request)
+        return httpx.Response(200, json={"keys": [public_jwk]})
+
+    decode_calls = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decode_calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    def token(sub, exp_in, kid="k1"):
+        claims = {"sub": sub, "exp": int(time.time()) + exp_in}
+        return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+
+    monkeypatch.setattr(app_module, "CLERK_JWKS_URL", "https://clerk.test/.well-known/jwks.json")
+    monkeypatch.setattr(app_module, "CLERK_ISSUER", "")
+    monkeypatch.setattr(app_module, "CLERK_AUDIENCE", "")
+    monkeypatch.setattr(app_module, "_jwks_cache", copy.deepcopy(app_module._jwks_cache))
+    app_module._jwks_cache["keys"] = None
+    monkeypatch.setattr(app_module, "_verified_tokens", app_module._TTLCache(2, 0))
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+
+    async def run():
+        app_module._http_clients["jwks"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            long_lived = token("user-1", 3600)
+            assert await app_module._verify_token(long_lived) == "user-1"
+            assert await app_module._verify_token(long_lived) == "user-1"
+            assert len(decode_calls) == 1
+
+            # Inside the clock-skew window the token verifies but is not cached.
+            nearly_expired = token("user-2", app_module.AUTH_CLOCK_SKEW - 5)
+            assert await app_module._verify_token(nearly_expired) == "user-2"
+            assert await app_module._verify_token(nearly_expired) == "user-2"
+            assert len(decode_calls) == 3
+            assert list(app_module._jwks_cache["key_objects"]) == [("k1", "RS256")]
+
+            with pytest.raises(HTTPException):
+                await app_module._verify_token(token("user-3", 3600, kid="unknown"))
+        finally:
+            await app_module._close_http_clients()
+
+    asyncio.run(run())
+
+    assert len(app_module._verified_tokens) == 1
+    # One fetch at startup, one forced refetch for the unknown kid.
+    assert len(jwks_fetches) == 2
+
+
+def test_jwks_refresh_is_single_flight_stale_while_revalidate_and_throttled(monkeypatch):
+    fetches = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(time.monotonic())
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"keys": [{"kid": f"k{len(fetches)}", "kty": "RSA"}]})
+
+    def mock_client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    monkeypatch.setattr(app_module, "CLERK_JWKS_URL", "https://clerk.test/.well-known/jwks.json")
+    monkeypatch.setattr(app_module, "JWKS_REFRESH_INTERVAL", 0)
+    monkeypatch.setattr(app_module, "_jwks_cache", copy.deepcopy(app_module._jwks_cache))
+    app_module._jwks_cache["keys"] = None
+
+    # Startup warms the key set.
+    app_module._http_clients["jwks"] = mock_client()
+    with TestClient(app):
+        assert len(fetches) == 1
+        assert set(app_module._jwks_cache["by_kid"]) == {"k1"}
+
+    async def run():
+        app_module._http_clients["jwks"] = mock_client()
+        try:
+            # Concurrent cold lookups share one fetch.
+            app_module._jwks_cache["keys"] = None
+            results = await asyncio.gather(*(app_module._get_jwks() for _ in range(5)))
+            assert len(fetches) == 2
+            assert all(result["keys"][0]["kid"] == "k2" for result in results)
+
+            # An expired set is served immediately while one refresh runs behind it.
+            app_module._jwks_cache["fetched_at"] = 0.0
+            stale = await asyncio.gather(*(app_module._get_jwks() for _ in range(5)))
+            assert all(result["keys"][0]["kid"] == "k2" for result in stale)
+            await asyncio.gather(*app_module._jwks_refresh_tasks)
+            assert len(fetches) == 3
+            assert set(app_module._jwks_cache["by_kid"]) == {"k3"}
+
+            # Unknown kids refetch at most once per JWKS_KID_MISS_INTERVAL.
+            for _ in range(3):
+                with pytest.raises(HTTPException):
+                    await app_module._get_signing_key("forged", "RS256")
+            assert len(fetches) == 4
+        finally:
+            await app_module._close_http_clients()
+
+    asyncio.run(run())
+
+
+def test_failed_jwks_refreshes_back_off_instead_of_refetching_per_request(monkeypatch):
+    fetches = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(request.url)
+        return httpx.Response(503)
+
+    monkeypatch.setattr(app_module, "CLERK_JWKS_URL", "https://clerk.test/.well-known/jwks.json")
+    monkeypatch.setattr(app_module, "JWKS_RETRY_BACKOFF", 60)
+    monkeypatch.setattr(app_module, "_jwks_cache", copy.deepcopy(app_module._jwks_cache))
+    app_module._jwks_cache.update(keys={"keys": []}, fetched_at=0.0, retry_at=float("-inf"), failures=0)
+
+    async def run():
+        app_module._http_clients["jwks"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            # An expired set stays in use; requests during the backoff start no fetch.
+            for _ in range(3):
+                for _ in range(5):
+                    assert await app_module._get_jwks() == {"keys": []}
+                await asyncio.gather(*app_module._jwks_refresh_tasks)
+            assert len(fetches) == 1
+            assert app_module._jwks_cache["failures"] == 1
+            first_retry_at = app_module._jwks_cache["retry_at"]
+
+            # Once the window passes, one more attempt, and the next window doubles.
+            app_module._jwks_cache["retry_at"] = 0.0
+            await app_module._get_jwks()
+            await asyncio.gather(*app_module._jwks_refresh_tasks)
+            assert len(fetches) == 2
+            assert app_module._jwks_cache["failures"] == 2
+            assert app_module._jwks_cache["retry_at"] - first_retry_at > 60
+
+            # Without any cached set, requests fail fast during the backoff.
+            app_module._jwks_cache["keys"] = None
+            with pytest.raises(RuntimeError):
+                await app_module._get_jwks()
+            assert len(fetches) == 2
+        finally:
+            await app_module._close_http_clients()
+
+    asyncio.run(run())
+
+
+def _metric_value(text, name, **labels):
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == name and all(sample.labels.get(key) == value for key, value in labels.items()):
+                return sample.value
+    return 0.0
+
+
+def test_metrics_endpoint_reports_routes_stages_and_fallback_reasons(monkeypatch):
+    init_db()
+    monkeypatch.setattr(app_module, "GOOGLE_API_KEY", "")
+
+    with TestClient(app) as client:
+        before = client.get("/metrics").text
+        record = client.post("/analyze", json={"message": "Our data shows a 20% lift in replies. Book a demo."})
+        assert record.status_code == 200
+        assert client.get(f"/analyses/{record.json()['id']}").status_code == 200
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    after = response.text
+
+    def delta(name, **labels):
+        return _metric_value(after, name, **labels) - _metric_value(before, name, **labels)
+
+    assert delta("pitchlens_http_request_duration_seconds_count", method="POST", route="/analyze") == 1
+    assert delta("pitchlens_http_requests_total", method="GET", route="/analyses/{analysis_id}", status="200") == 1
+    assert delta("pitchlens_stage_duration_seconds_count", stage="db_insert") >= 1
+    assert delta("pitchlens_analyses_total", source="fallback", fallback_reason="not_configured") == 1
+    assert _metric_value(after, "pitchlens_in_flight", kind="gemini") == 0
+
+    monkeypatch.setattr(app_module, "GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(app_module, "GEMINI_CLIENT_MODE", "async")
+    request = httpx.Request("POST", "https://gemini.test")
+    too_many = httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+    assert app_module._fallback_reason_class(too_many) == "rate_limited"
+    assert app_module._fallback_reason_class(httpx.ReadTimeout("slow", request=request)) == "timeout"
+    assert app_module._fallback_reason_class(ValueError("No valid JSON object found.")) == "invalid_output"
+
+
+def test_metrics_aggregate_across_worker_processes(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = "import metrics; metrics.record_analysis('gemini'); metrics.observe_stage('parse', 0.01)"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=BACKEND_ROOT, env=env, check=True)
+    rendered = subprocess.run(
+        [sys.executable, "-c", "import sys, metrics; sys.stdout.write(metrics.render()[0].decode())"],
+        cwd=BACKEND_ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    assert _metric_value(rendered, "pitchlens_analyses_total", source="gemini", fallback_reason="none") == 2
+    assert _metric_value(rendered, "pitchlens_stage_duration_seconds_count", stage="parse") == 2
+
+
+def test_settings_read_at_import_come_from_dotenv(tmp_path):
+    (tmp_path / ".env").write_text(
+        f"METRICS_ENABLED=false\nDB_COMPRESSION=none\nPROMETHEUS_MULTIPROC_DIR={tmp_path}\n"
+    )
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key not in ("METRICS_ENABLED", "DB_COMPRESSION", "PROMETHEUS_MULTIPROC_DIR")
+    }
+    script = (
+        f"import sys; sys.path.insert(0, {BACKEND_ROOT!r}); import app, compression, metrics; "
+        "print(metrics.METRICS_ENABLED, compression.DB_COMPRESSION, metrics.PROMETHEUS_MULTIPROC_DIR)"
+    )
+    # `python -c` makes python-dotenv look for .env in the working directory.
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=tmp_path, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert output.split() == ["False", "none", str(tmp_path)]
+
+
+def test_server_timing_header_and_log_line_break_down_stages(monkeypatch, caplog):
+    init_db()
+    monkeypatch.setattr(app_module, "GOOGLE_API_KEY", "")
+    monkeypatch.setattr(app_module, "RATE_LIMIT_PER_MINUTE", 1000)
+
+    with caplog.at_level(logging.INFO, logger=app_module.logger.name):
+        with TestClient(app) as client:
+            response = client.post(
+                "/analyze",
+                json={"message": "Our data shows a 20% lift in replies. Book a demo."},
+                headers={"X-Request-ID": "timing-check"},
+            )
+
+    assert response.status_code == 200
+    entries = {}
+    for entry in response.headers["Server-Timing"].split(", "):
+        name, duration = entry.split(";dur=")
+        entries[name] = float(duration)
+    assert {"rate_limit", "cache_lookup", "db_insert", "total"} <= set(entries)
+    assert entries["total"] >= entries["db_insert"]
+
+    line = next(record.getMessage() for record in caplog.records if "request_id=timing-check" in record.getMessage())
+    assert "duration_ms=" in line
+    assert "db_insert:" in line and "rate_limit:" in line
@@ -0,0 +1,136 @@
+import asyncio
+import http.server
+import ipaddress
+import json
+import os
+import socket
+import sys
+import threading
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+CURRENT_DIR = os.path.dirname(__file__)
+BACKEND_ROOT = os.path.dirname(CURRENT_DIR)
+
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import app as app_module
+import compression
+
+
+def test_dns_results_are_cached_including_failures(monkeypatch):
+    lookups = []
+
+    async def fake_getaddrinfo(host, port, type=0):
+        lookups.append(host)
+        if host == "missing.example":
+            raise socket.gaierror("not found")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", 0))]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(loop, "getaddrinfo", fake_getaddrinfo)
+        first = await app_module._resolve_host_ips("cached.example")
+        second = await app_module._resolve_host_ips("cached.example")
+        missing = [await app_module._resolve_host_ips("missing.example") for _ in range(2)]
+        return first, second, missing
+
+    app_module._dns_cache.clear()
+    first, second, missing = asyncio.run(run())
+    app_module._dns_cache.clear()
+
+    assert first == second
+    assert missing == [[], []]
+    assert lookups == ["cached.example", "missing.example"]
+
+
+def test_pinned_transport_connects_only_to_validated_addresses():
+    seen_hosts = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen_hosts.append(self.headers["Host"])
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    async def run():
+        async with httpx.AsyncClient(transport=app_module._PinnedTransport()) as http_client:
+            app_module._pinned_addresses.set({"pinned.example": (ipaddress.ip_address("127.0.0.1"),)})
+            pinned = await http_client.get(f"http://pinned.example:{port}/")
+            try:
+                await http_client.get(f"http://unvalidated.example:{port}/")
+            except httpx.ConnectError:
+                refused = True
+            else:
+                refused = False
+        return pinned, refused
+
+    try:
+        pinned, refused = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert pinned.text == "ok"
+    assert seen_hosts == [f"pinned.example:{port}"]
+    assert refused
+
+
+def test_memory_rate_limiter_is_bounded_and_usable_as_primary(monkeypatch):
+    limiter = app_module._MemoryRateLimiter(max_keys=8, shards=2)
+    now = 1000.0
+    for _ in range(3):
+        assert limiter.consume("client", now, 20.0)
+    assert not limiter.consume("client", now, 20.0)
+    assert limiter.consume("client", now + 20.0, 20.0)
+
+    for index in range(50):
+        limiter.consume(f"ip-{index}", now, 20.0)
+    assert len(limiter) <= 8
+    assert limiter.evicted > 0
+
+    # Drained keys are swept before any live key is evicted.
+    sweep = app_module._MemoryRateLimiter(max_keys=4, shards=1)
+    for index in range(3):
+        sweep.consume(f"old-{index}", now, 1.0)
+    sweep.consume("new", now + 10.0, 1.0)
+    assert len(sweep) == 1
+    assert sweep.evicted == 0
+
+    monkeypatch.setattr(app_module, "RATE_LIMIT_PER_MINUTE", 2)
+    monkeypatch.setattr(app_module, "RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(app_module, "_memory_rate_limiter", app_module._MemoryRateLimiter(max_keys=16))
+
+    class UnusableSession:
+        def __getattr__(self, name):
+            raise AssertionError("memory backend must not touch the database")
+
+    asyncio.run(app_module._enforce_rate_limit(UnusableSession(), "memory-key"))
+    asyncio.run(app_module._enforce_rate_limit(UnusableSession(), "memory-key"))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(app_module._enforce_rate_limit(UnusableSession(), "memory-key"))
+    assert exc.value.status_code == 429
+
+
+def test_compression_codec_round_trips_and_reads_legacy_values():
+    meta = {"source": "fallback", "model": "deterministic-v2", "note": "ü" * 40}
+    encoded = compression.encode_text(json.dumps(meta), compression.CODEC_ZLIB_V1)
+    assert encoded[:2] == bytes((compression.MAGIC, compression.CODEC_ZLIB_V1))
+    assert json.loads(compression.decode_text(encoded)) == meta
+    # Uncompressed values are stored in the plain pre-compression form.
+    assert compression.encode_text(json.dumps(meta), compression.CODEC_RAW) == json.dumps(meta).encode("utf-8")
+    assert compression.encode_text("short") == b"short"
+    assert compression.decode_text(bytes((compression.MAGIC, compression.CODEC_RAW)) + b"raw") == "raw"
+    assert compression.decode_text("legacy plain text") == "legacy plain text"
+    assert compression.decode_text(b'{"legacy": true}') == '{"legacy": true}'